@@ -0,0 +1,72 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework import status
+from django.core.cache import cache
+from django.conf import settings
+import hashlib
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+
+
+def idempotency_key(user_pk, key):
+    return f'idempotency:{user_pk}:{key}'
+
+
+class IdempotentCreateMixin:
+    """
+    Honours an Idempotency-Key header on POST: a retry with the same key gets the
+    stored response back instead of running again.
+
+    The first request reserves the key with cache.add, so a retry that arrives while
+    it is still running gets 409 instead of a second booking. The reservation only
+    lives IDEMPOTENCY_LOCK_TIMEOUT seconds, longer than any request may run, so a
+    worker killed mid-request doesn't block the key for long. Successful and
+    validation-error responses are kept for IDEMPOTENCY_KEY_TIMEOUT seconds; any other
+    failure frees the key so the client can try again.
+    """
+    def post(self, request, *args, **kwargs):
+        key = request.META.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return super().post(request, *args, **kwargs)
+
+        cache_key = idempotency_key(request.user.pk, key)
+        fingerprint = hashlib.md5(request.path.encode() + request.body).hexdigest()
+        timeout = settings.IDEMPOTENCY_KEY_TIMEOUT
+
+        if not cache.add(cache_key, {'fingerprint': fingerprint}, settings.IDEMPOTENCY_LOCK_TIMEOUT):
+            return self.replay(cache.get(cache_key), fingerprint)
+
+        try:
+            response = super().post(request, *args, **kwargs)
+        except ValidationError as error:
+            cache.set(cache_key, {
+                'fingerprint': fingerprint,
+                'status': error.status_code,
+                'data': error.detail,
+            }, timeout)
+            raise
+        except Exception:
+            cache.delete(cache_key)
+            raise
+
+        cache.set(cache_key, {
+            'fingerprint': fingerprint,
+            'status': response.status_code,
+            'data': dict(response.data),
+        }, timeout)
+        return response
+
+    def replay(self, stored, fingerprint):
+        if stored is None or 'status' not in stored:
+            return Response(
+                'A request with this Idempotency-Key is still in progress!',
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        if stored['fingerprint'] != fingerprint:
+            return Response(
+                'This Idempotency-Key was already used for a different request!',
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+
+        return Response(stored['data'], status=stored['status'], headers={'Idempotent-Replayed': 'true'})
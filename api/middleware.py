@@ -1,31 +1,151 @@
 from datetime import datetime, timezone, timedelta
-from django.contrib.auth import logout
+from django.contrib.auth import get_user_model, logout
+from rest_framework.authtoken.models import Token
+from django.core.cache import cache
 from django.http import HttpResponse
 from django.shortcuts import redirect
+from django.conf import settings
 from django.urls import reverse
 from rest_framework import status
+from cinema.caching import add_to_set, pop_set, remove_from_set
+
+User = get_user_model()
+
+PENDING_KEY = 'last-activity:pending'
+EXPIRED_TOKENS_KEY = 'last-activity:expired-tokens'
+
+
+def activity_key(user_pk):
+    return f'last-activity:{user_pk}'
+
+
+def token_activity_key(token_key):
+    return f'last-activity:token:{token_key}'
+
+
+def activity_timeout():
+    # Past this a user is idle anyway, and the user row is enough to tell with a cold cache
+    return settings.LAST_ACTIVITY_TIMEOUT + settings.LAST_ACTIVITY_GRANULARITY
+
+
+def buffer_activity(user_pk):
+    """Mark the user for the next batched flush of cached timestamps."""
+    add_to_set(PENDING_KEY, str(user_pk))
+
+
+def flush_activity():
+    """Write all buffered timestamps with one bulk UPDATE per batch."""
+    pending = [int(user_pk) for user_pk in pop_set(PENDING_KEY)]
+    if not pending:
+        return 0
+
+    timestamps = cache.get_many([activity_key(user_pk) for user_pk in pending])
+    users = [
+        User(pk=user_pk, last_activity=timestamps[activity_key(user_pk)])
+        for user_pk in pending if activity_key(user_pk) in timestamps
+    ]
+    User.objects.bulk_update(users, ['last_activity'], batch_size=500)
+    return len(users)
+
+
+def reset_activity(user, token_key=None):
+    """Start a fresh idle window after login, so a stale cached timestamp can't log the user out."""
+    now = datetime.now(timezone.utc)
+    timestamps = {activity_key(user.pk): now}
+
+    if token_key:
+        timestamps[token_activity_key(token_key)] = now
+        remove_from_set(EXPIRED_TOKENS_KEY, token_key)
+
+    cache.set_many(timestamps, activity_timeout())
+    # Logins are rare; the stored time keeps the database fallback of delete_expired_tokens in step
+    User.objects.filter(pk=user.pk).update(last_activity=now)
+    user.last_activity = now
+
+
+def expire_token(token_key):
+    """Queue an idle token for deletion instead of deleting it inside the request."""
+    if settings.CACHE_SHARED:
+        add_to_set(EXPIRED_TOKENS_KEY, token_key)
+
+
+def delete_expired_tokens():
+    """
+    Delete the idle tokens queued by the middleware. Without a shared cache the celery
+    worker can't see that queue, so tokens of users idle in the database are deleted instead.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.LAST_ACTIVITY_TIMEOUT)
+
+    if not settings.CACHE_SHARED:
+        # The stored time may lag real activity by up to one granularity step
+        cutoff -= timedelta(seconds=settings.LAST_ACTIVITY_GRANULARITY)
+        deleted, _ = Token.objects.filter(user__is_staff=False, user__last_activity__lt=cutoff).delete()
+        return deleted
+
+    expired = pop_set(EXPIRED_TOKENS_KEY)
+    if not expired:
+        return 0
+
+    # Skip tokens that were used again after a login since they were queued
+    timestamps = cache.get_many([token_activity_key(token_key) for token_key in expired])
+    expired = [
+        token_key for token_key in expired
+        if timestamps.get(token_activity_key(token_key), cutoff) <= cutoff
+    ]
+    cache.delete_many([token_activity_key(token_key) for token_key in expired])
+    deleted, _ = Token.objects.filter(key__in=expired).delete()
+    return deleted
 
 
 class LastActivityMiddleware:
+    """
+    Logs out non-staff users after LAST_ACTIVITY_TIMEOUT seconds of inactivity.
+
+    The last-seen time lives in the cache (per user, or per token for API clients), so
+    the timeout decision is a single cache GET. The user row is only a fallback for a
+    cold cache: it is written when older than LAST_ACTIVITY_GRANULARITY seconds, or in
+    batches by the flush_last_activity task when LAST_ACTIVITY_BUFFERED is on.
+    Idle tokens keep being rejected and are deleted later by delete_expired_tokens.
+    """
     def __init__(self, get_response):
         self.get_response = get_response
+        self.timeout = timedelta(seconds=settings.LAST_ACTIVITY_TIMEOUT)
+        self.granularity = timedelta(seconds=settings.LAST_ACTIVITY_GRANULARITY)
+        self.buffered = settings.LAST_ACTIVITY_BUFFERED
 
     def __call__(self, request):
         response = self.get_response(request)
         user = request.user
 
         if user.is_authenticated and not user.is_staff:
-            last_activity = user.last_activity
-            user.last_activity = datetime.now(timezone.utc)
-            user.save()
+            now = datetime.now(timezone.utc)
+            token = getattr(request, 'auth', None)
+            key = token_activity_key(token.key) if isinstance(token, Token) else activity_key(user.pk)
+            last_activity = cache.get(key)
+
+            # Cold cache: the stored value may lag real activity by up to one granularity step
+            if last_activity is None and user.last_activity:
+                last_activity = user.last_activity + self.granularity
+
             if last_activity:
-                if datetime.now(timezone.utc) - last_activity > timedelta(minutes=1):
+                if now - last_activity > self.timeout:
                     if hasattr(request, 'auth'):
-                        request.auth.delete()
+                        if isinstance(token, Token):
+                            expire_token(token.key)
                         logout(request)
                         return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
 
                     logout(request)
                     return redirect(reverse('login_page'))
 
-        return response
\ No newline at end of file
+            cache.set_many({key: now, activity_key(user.pk): now}, activity_timeout())
+            self.persist_activity(user, now)
+
+        return response
+
+    def persist_activity(self, user, now):
+        if self.buffered:
+            buffer_activity(user.pk)
+        elif not user.last_activity or now - user.last_activity > self.granularity:
+            User.objects.filter(pk=user.pk).update(last_activity=now)
+            user.last_activity = now
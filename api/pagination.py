@@ -0,0 +1,129 @@
+from rest_framework.pagination import BasePagination
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.response import Response
+from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+from django.db.models import Q
+import json
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks on the full ordering tuple (always ending with 'id').
+
+    Unlike DRF's CursorPagination, which keys on the first ordering field plus an
+    offset, every page is a single indexed range probe, no matter how many rows share
+    the same date or time.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering = ('start_date', 'start_time', 'id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        ordering = self.get_ordering(request, queryset, view)
+        position, reverse = self.decode_cursor(request, queryset.model, ordering)
+
+        if reverse:
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_seek_filter(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.ordering_fields = [name.lstrip('-') for name in ordering]
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+        if view is not None and OrderingFilter in getattr(view, 'filter_backends', []):
+            ordering = OrderingFilter().get_ordering(request, queryset, view)
+
+        ordering = list(ordering or self.ordering)
+        if not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            ordering.append('id')
+        return ordering
+
+    def get_seek_filter(self, ordering, position):
+        # (a, b, c) > (x, y, z)  ==  a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        seek = Q()
+        for index, name in enumerate(ordering):
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition = Q(**{field.lstrip('-'): value for field, value in zip(ordering[:index], position)})
+            condition &= Q(**{f'{name.lstrip("-")}__{lookup}': position[index]})
+            seek |= condition
+        return seek
+
+    def decode_cursor(self, request, model, ordering):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            cursor = json.loads(urlsafe_base64_decode(encoded))
+            values = cursor['p']
+            if len(values) != len(ordering):
+                raise ValueError
+            position = [
+                model._meta.get_field(name.lstrip('-')).to_python(value)
+                for name, value in zip(ordering, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, bool(cursor.get('r'))
+
+    def encode_cursor(self, instance, reverse):
+        model = type(instance)
+        values = [model._meta.get_field(name).value_to_string(instance) for name in self.ordering_fields]
+        cursor = {'p': values, 'r': int(reverse)}
+        encoded = urlsafe_base64_encode(json.dumps(cursor).encode())
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
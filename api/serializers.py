@@ -1,11 +1,20 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.contrib.auth.models import BaseUserManager
+from django.db import IntegrityError, transaction
+from datetime import datetime, timedelta
+from copy import copy
 from django.contrib.auth import password_validation
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.reverse import reverse
+from cinema.renditions import RENDITIONS, poster_sources
 from cinema.models import (
+    BookingRequest,
     CinemaHall,
     Film,
+    SeatHold,
     Session,
     Ticket,
 )
@@ -31,23 +40,80 @@ class CinemaHallSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'size',
+            'rows',
         ]
 
 
 class FilmSerializer(serializers.ModelSerializer):
+    renditions = serializers.SerializerMethodField()
+
     class Meta:
         model = Film
         fields = [
             'id',
             'name',
             'genre',
-            'image'
+            'image',
+            'renditions',
         ]
 
+    def get_renditions(self, obj):
+        if not obj.image:
+            return {}
+        request = self.context.get('request')
+        build_url = request.build_absolute_uri if request else None
+        return {name: poster_sources(obj, name, build_url) for name in RENDITIONS}
+
+
+class SparseFieldsMixin:
+    """
+    Lets clients ask for a subset of fields, e.g. ?fields=id,price,start_time. Only on
+    reads: writes go through the same serializer and need every field to validate.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        request = self.context.get('request')
+        fields = request.query_params.get('fields') if request and request.method in SAFE_METHODS else None
+
+        # Only the top-level serializer is trimmed, expanded objects stay whole
+        if self.context.get('nested'):
+            return
+
+        if fields:
+            allowed = set(fields.split(','))
+            for field_name in set(self.fields) - allowed:
+                self.fields.pop(field_name)
+
 
-class SessionSerializer(serializers.ModelSerializer):
+class ExpandableFieldsMixin:
+    """
+    Replaces related primary keys with nested objects, e.g. ?expand=film,hall. Only on
+    reads: the nested objects are read-only, so a write would drop the submitted keys.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        request = self.context.get('request')
+        expand = request.query_params.get('expand') if request and request.method in SAFE_METHODS else None
+
+        if expand:
+            nested_context = {**self.context, 'nested': True}
+            for field_name in expand.split(','):
+                if field_name in self.expandable_fields:
+                    serializer_class = self.expandable_fields[field_name]
+                    self.fields[field_name] = serializer_class(read_only=True, context=nested_context)
+
+
+class SessionSerializer(SparseFieldsMixin, ExpandableFieldsMixin, serializers.ModelSerializer):
     film = serializers.PrimaryKeyRelatedField(queryset=Film.objects.all())
     hall = serializers.PrimaryKeyRelatedField(queryset=CinemaHall.objects.all())
+    expandable_fields = {
+        'film': FilmSerializer,
+        'hall': CinemaHallSerializer,
+    }
 
     class Meta:
         model = Session
@@ -69,44 +135,138 @@ class SessionSerializer(serializers.ModelSerializer):
         }
 
     def validate(self, data):
-        hall = data['hall']
+        self.validate_schedule(data)
+
+        # Same indexed probe the form runs: the exclusion constraint checked against unsaved values
+        session = copy(self.instance) if self.instance else Session()
+        for field_name, value in data.items():
+            setattr(session, field_name, value)
+
+        try:
+            session.validate_constraints()
+        except DjangoValidationError as error:
+            raise serializers.ValidationError(error.messages)
+
+        return data
+
+    def validate_schedule(self, data):
         start_date = data['start_date']
         end_date = data['end_date']
-        start_time = data['start_time']
-        end_time = data['end_time']
         price = data['price']
 
-        session = Session.objects.filter(
-            hall=hall,
-            start_date__lte=end_date,
-            end_date__gte=start_date,
-            start_time__lte=end_time,
-            end_time__gte=start_time,
-        ).exclude(pk=getattr(self.instance, 'pk', None))
-
-        if session.exists():
-            times = session.values_list('start_time', 'end_time')
-            times_string = [f'{str(start_time)[:-3]}-{str(end_time)[:-3]}'
-                            for start_time, end_time in times]
-            raise serializers.ValidationError(f"This hall has a session for that time: {times_string[0]}")
-
         if start_date > end_date:
             raise serializers.ValidationError("Start date must be before end date.")
 
         if price < 0:
             raise serializers.ValidationError("Price cannot be negative.")
+
+    def save(self, **kwargs):
+        # Two overlapping sessions that pass validation concurrently are still rejected by the database
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except IntegrityError:
+            raise serializers.ValidationError("This hall has a session for that time.")
+
+
+class SessionBulkSerializer(SessionSerializer):
+    """
+    One entry of a bulk schedule. With repeat_every (minutes) and repeat_count the entry
+    expands into several shows a day, e.g. 10:00-12:00 every 150 minutes, 4 times.
+    Overlaps are checked for the whole batch at once, not per entry.
+    """
+    repeat_every = serializers.IntegerField(min_value=1, required=False, write_only=True)
+    repeat_count = serializers.IntegerField(min_value=1, max_value=48, default=1, write_only=True)
+
+    class Meta(SessionSerializer.Meta):
+        fields = SessionSerializer.Meta.fields + ['repeat_every', 'repeat_count']
+
+    def validate(self, data):
+        self.validate_schedule(data)
+
+        if data['repeat_count'] > 1 and not data.get('repeat_every'):
+            raise serializers.ValidationError("Enter value for 'repeat_every'!")
+
+        last_show = (data['repeat_count'] - 1) * data.get('repeat_every', 0)
+        end = datetime.combine(data['start_date'], data['end_time'])
+        if data['end_time'] < data['start_time']:
+            end += timedelta(days=1)
+        if last_show and (end + timedelta(minutes=last_show)).date() != data['start_date']:
+            raise serializers.ValidationError("Repeated sessions must end before midnight.")
+
         return data
 
+    @staticmethod
+    def build_sessions(data):
+        data = dict(data)
+        repeat_every = data.pop('repeat_every', 0)
+        repeat_count = data.pop('repeat_count')
+        start = datetime.combine(data['start_date'], data.pop('start_time'))
+        end = datetime.combine(data['start_date'], data.pop('end_time'))
+        sessions = []
+
+        for index in range(repeat_count):
+            shift = timedelta(minutes=index * repeat_every)
+            sessions.append(Session(**data, start_time=(start + shift).time(), end_time=(end + shift).time()))
+        return sessions
+
+
+class SeatSerializer(serializers.Serializer):
+    row = serializers.IntegerField(min_value=1)
+    seat = serializers.IntegerField(min_value=1)
+
 
 class TicketBookSerializer(serializers.ModelSerializer):
+    seats = SeatSerializer(many=True, required=False, write_only=True)
+
     class Meta:
         model = Ticket
-        fields = ['count_of_tickets']
+        fields = ['count_of_tickets', 'seats']
+
+
+class SeatHoldSerializer(serializers.ModelSerializer):
+    seats = SeatSerializer(many=True, required=False, write_only=True)
+
+    class Meta:
+        model = SeatHold
+        fields = [
+            'id',
+            'session',
+            'date',
+            'count_of_tickets',
+            'seats',
+            'expires_at',
+        ]
+        read_only_fields = ['session', 'date', 'expires_at']
 
 
-class TicketSerializer(serializers.ModelSerializer):
+class BookingRequestSerializer(serializers.ModelSerializer):
+    status_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BookingRequest
+        fields = [
+            'id',
+            'session',
+            'date',
+            'count_of_tickets',
+            'status',
+            'ticket',
+            'error',
+            'status_url',
+        ]
+
+    def get_status_url(self, obj):
+        return reverse('booking-detail', args=[obj.pk], request=self.context.get('request'))
+
+
+class TicketSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
     session = serializers.PrimaryKeyRelatedField(queryset=Session.objects.all())
+    seats = serializers.SerializerMethodField()
+    expandable_fields = {
+        'session': SessionSerializer,
+    }
 
     class Meta:
         model = Ticket
@@ -118,8 +278,15 @@ class TicketSerializer(serializers.ModelSerializer):
             'total_price',
             'data_session',
             'count_of_tickets',
+            'seats',
         ]
 
+    def get_seats(self, obj):
+        if not obj.seats:
+            return []
+        hall = obj.session.hall
+        return [dict(zip(('row', 'seat'), hall.seat_position(index))) for index in obj.seats]
+
 
 # Authentication
 class UserLoginSerializer(serializers.Serializer):
@@ -0,0 +1,8 @@
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+from api.middleware import reset_activity
+
+
+@receiver(user_logged_in)
+def reset_last_activity(sender, request, user, **kwargs):
+    reset_activity(user)
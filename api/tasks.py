@@ -0,0 +1,14 @@
+from celery import shared_task
+from api.middleware import flush_activity, delete_expired_tokens
+
+
+@shared_task
+def flush_last_activity():
+    flushed = flush_activity()
+    return f'Successfully flushed last activity for {flushed} users'
+
+
+@shared_task
+def delete_idle_tokens():
+    deleted = delete_expired_tokens()
+    return f'Successfully deleted {deleted} idle tokens'
@@ -0,0 +1,148 @@
+from datetime import datetime, timezone, timedelta
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from api.middleware import activity_key, buffer_activity, flush_activity, reset_activity, token_activity_key
+from api.tasks import flush_last_activity, delete_idle_tokens
+from cinema.factory import UserFactory
+import threading
+
+User = get_user_model()
+
+
+class LastActivityMiddlewareTestCase(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_login(self.user)
+        self.url = reverse('booked_tickets')
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_updates_last_activity(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(User.objects.get(pk=self.user.pk).last_activity)
+
+    def test_skips_recent_last_activity(self):
+        last_activity = datetime.now(timezone.utc) - timedelta(seconds=2)
+        User.objects.filter(pk=self.user.pk).update(last_activity=last_activity)
+
+        self.client.get(self.url)
+
+        self.assertEqual(User.objects.get(pk=self.user.pk).last_activity, last_activity)
+
+    def test_activity_keys_expire(self):
+        self.client.get(self.url)
+
+        with override_settings(LAST_ACTIVITY_TIMEOUT=0, LAST_ACTIVITY_GRANULARITY=0):
+            self.client.get(self.url)
+        self.assertIsNone(cache.get(activity_key(self.user.pk)))
+
+    def test_idle_logout(self):
+        cache.set(activity_key(self.user.pk), datetime.now(timezone.utc) - timedelta(minutes=5))
+
+        response = self.client.get(self.url)
+
+        self.assertRedirects(response, reverse('login_page'))
+
+    def test_idle_logout_cold_cache(self):
+        last_activity = datetime.now(timezone.utc) - timedelta(minutes=5)
+        User.objects.filter(pk=self.user.pk).update(last_activity=last_activity)
+        cache.clear()
+
+        response = self.client.get(self.url)
+
+        self.assertRedirects(response, reverse('login_page'))
+
+    def test_login_resets_idle_window(self):
+        cache.set(activity_key(self.user.pk), datetime.now(timezone.utc) - timedelta(minutes=5))
+        self.client.force_login(self.user)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(LAST_ACTIVITY_BUFFERED=True)
+    def test_buffered_last_activity(self):
+        User.objects.filter(pk=self.user.pk).update(last_activity=None)
+
+        self.client.get(self.url)
+        self.assertIsNone(User.objects.get(pk=self.user.pk).last_activity)
+
+        flush_last_activity()
+        self.assertIsNotNone(User.objects.get(pk=self.user.pk).last_activity)
+
+    def test_concurrent_buffered_activity(self):
+        users = [UserFactory(username=f'user{i}', email=f'user{i}@gmail.com') for i in range(20)]
+        now = datetime.now(timezone.utc)
+        cache.set_many({activity_key(user.pk): now for user in users}, None)
+
+        threads = [threading.Thread(target=buffer_activity, args=(user.pk,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(flush_activity(), 20)
+        self.assertEqual(User.objects.filter(last_activity=now).count(), 20)
+        self.assertEqual(flush_activity(), 0)
+
+
+class IdleTokenTestCase(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.url = reverse('ticket-list')
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_active_token(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(cache.get(token_activity_key(self.token.key)))
+
+    @override_settings(CACHE_SHARED=True)
+    def test_idle_token(self):
+        cache.set(token_activity_key(self.token.key), datetime.now(timezone.utc) - timedelta(minutes=5))
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+        self.assertTrue(Token.objects.filter(pk=self.token.pk).exists())
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+        delete_idle_tokens()
+        self.assertFalse(Token.objects.filter(pk=self.token.pk).exists())
+
+    @override_settings(CACHE_SHARED=True)
+    def test_idle_token_login_again(self):
+        cache.set(token_activity_key(self.token.key), datetime.now(timezone.utc) - timedelta(minutes=5))
+        self.client.get(self.url)
+
+        reset_activity(self.user, self.token.key)
+        delete_idle_tokens()
+
+        self.assertTrue(Token.objects.filter(pk=self.token.pk).exists())
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_idle_token_without_shared_cache(self):
+        active = Token.objects.create(user=UserFactory(username='active', email='active@gmail.com'))
+        User.objects.filter(pk=active.user_id).update(last_activity=datetime.now(timezone.utc))
+        User.objects.filter(pk=self.user.pk).update(last_activity=datetime.now(timezone.utc) - timedelta(minutes=5))
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+        delete_idle_tokens()
+        self.assertFalse(Token.objects.filter(pk=self.token.pk).exists())
+        self.assertTrue(Token.objects.filter(pk=active.pk).exists())
@@ -1,6 +1,23 @@
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
-from datetime import date, timedelta
+from django.test import override_settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.http import http_date
+from cinema.caching import SCHEDULE
+from api.idempotency import idempotency_key
+from cinema.services import process_booking_requests
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from datetime import date, time, timedelta
+from time import sleep
+import base64
+import shutil
+import tempfile
+from io import BytesIO
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from cinema.models import CinemaHall, Film, Session, Ticket
 from rest_framework import status
 from django.urls import reverse
 from cinema.factory import (
@@ -35,16 +52,16 @@ class SessionListAPITestCase(APITestCase):
         response = self.client.get(url, {'date-filter': 'tomorrow'})
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
-        self.assertEqual(response.data[1]['id'], self.session.id)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(response.data['results'][1]['id'], self.session.id)
 
     def test_date_filter_today(self):
         url = reverse('session-list')
         response = self.client.get(url, {'date-filter': 'today'})
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['id'], self.session_today.id)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['id'], self.session_today.id)
 
     def test_price_filter(self):
         self.session_correct_price = SessionFactory(price=60)
@@ -52,9 +69,9 @@ class SessionListAPITestCase(APITestCase):
         url = reverse('session-list')
         response = self.client.get(url, {'price_from': 60, 'price_to': 80, 'date-filter': 'tomorrow'})
 
-        self.assertEqual(len(response.data), 2)
-        self.assertIn(self.session_correct_price.id, [session['id'] for session in response.data])
-        self.assertNotIn(self.session_today.id, [session['id'] for session in response.data])
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIn(self.session_correct_price.id, [session['id'] for session in response.data['results']])
+        self.assertNotIn(self.session_today.id, [session['id'] for session in response.data['results']])
 
     def test_hall_filter(self):
         self.session_correct_hall = SessionFactory(hall__id=6)
@@ -62,13 +79,130 @@ class SessionListAPITestCase(APITestCase):
         url = reverse('session-list')
         response = self.client.get(url, {'hall_id': 6})
 
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     def test_time_filter(self):
         url = reverse('session-list')
         response = self.client.get(url, {'time_from': '12:00', 'time_to': '13:00'})
 
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_cursor_pagination(self):
+        SessionFactory.create_batch(4, start_time='10:00')
+        url = reverse('session-list')
+
+        response = self.client.get(url, {'date-filter': 'tomorrow', 'page_size': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['previous'])
+
+        seen = [session['id'] for session in response.data['results']]
+        next_url = response.data['next']
+        while next_url:
+            response = self.client.get(next_url)
+            seen += [session['id'] for session in response.data['results']]
+            next_url = response.data['next']
+
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(len(set(seen)), 6)
+
+        response = self.client.get(response.data['previous'])
+        self.assertEqual([session['id'] for session in response.data['results']], seen[2:4])
+
+    def test_invalid_cursor(self):
+        url = reverse('session-list')
+        response = self.client.get(url, {'cursor': 'broken'})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_expand(self):
+        url = reverse('session-list')
+        response = self.client.get(url, {'expand': 'film,hall'})
+        session = response.data['results'][0]
+
+        self.assertEqual(session['film']['name'], 'Batman')
+        self.assertEqual(session['hall']['size'], 10)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+    def test_expand_query_count(self):
+        url = reverse('session-list')
+        params = {'date-filter': 'tomorrow', 'expand': 'film,hall'}
+
+        # Warm-up request so one-off writes (e.g. last_activity) don't skew the comparison
+        self.client.get(url, params)
+
+        with CaptureQueriesContext(connection) as few_sessions:
+            self.client.get(url, params)
+
+        SessionFactory.create_batch(5)
+
+        with CaptureQueriesContext(connection) as many_sessions:
+            response = self.client.get(url, params)
+
+        self.assertEqual(len(response.data['results']), 7)
+        self.assertEqual(len(few_sessions), len(many_sessions))
+
+    def test_cache_invalidation(self):
+        url = reverse('session-list')
+        self.client.get(url)
+
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        AvailableSeatsFactory(session=self.session_today, occupied_seats=3)
+        self.session_today.price = '99.00'
+        self.session_today.save()
+
+        response = self.client.get(url)
+        self.assertEqual(response.data['results'][0]['price'], '99.00')
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+    def test_conditional_get(self):
+        url = reverse('session-list')
+        response = self.client.get(url, {'expand': 'film'})
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'expand': 'film'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(url, {'expand': 'film'}, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        film = self.session_today.film
+        film.name = 'Joker'
+        film.save()
+
+        response = self.client.get(url, {'expand': 'film'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['film']['name'], 'Joker')
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        self.session_today.delete()
+
+        response = self.client.get(url, {'expand': 'film'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_modified_since_yesterday(self):
+        url = reverse('session-list')
+        two_days_ago = timezone.now() - timedelta(days=2)
+        # Nothing changed since, but the listing of today has other sessions than two days ago
+        for model in (Session, Film, CinemaHall):
+            model.objects.update(updated_at=two_days_ago)
+        cache.set(f'version:{SCHEDULE}', int(two_days_ago.timestamp() * 10 ** 9), None)
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(two_days_ago.timestamp() + 60))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_sparse_fields(self):
+        url = reverse('session-list')
+        response = self.client.get(url, {'fields': 'id,price'})
+
+        self.assertEqual(set(response.data['results'][0]), {'id', 'price'})
 
 
 class SessionAPITestCase(APITestCase):
@@ -91,6 +225,59 @@ class SessionAPITestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    def test_create_session_ignores_sparse_fields(self):
+        url = reverse('session-create')
+        response = self.client.post(f'{url}?fields=id', self.session_data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['start_date'], self.session_data['start_date'])
+
+    def test_create_session_ignores_expand(self):
+        url = reverse('session-create')
+        response = self.client.post(f'{url}?expand=film,hall', self.session_data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['hall'], self.session_data['hall'])
+
+    def test_create_overlapping_session(self):
+        SessionFactory(
+            hall_id=self.session_data['hall'],
+            start_time='11:00',
+            end_time='13:00',
+            start_date=date(2024, 4, 28),
+            end_date=date(2024, 5, 2),
+        )
+
+        url = reverse('session-create')
+        response = self.client.post(url, self.session_data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('This hall has a session for that time.', response.data['non_field_errors'])
+
+    def test_create_overnight_session(self):
+        SessionFactory(
+            hall_id=self.session_data['hall'],
+            start_time='10:00',
+            end_time='21:00',
+            start_date=date(2024, 4, 20),
+            end_date=date(2024, 5, 2),
+        )
+        url = reverse('session-create')
+        data = {**self.session_data, 'start_time': '22:00', 'end_time': '01:00'}
+
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # Runs into the 00:30 show of the day after its last date
+        data.update(start_time='00:30', end_time='02:00', start_date='2024-05-01', end_date='2024-05-01')
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('This hall has a session for that time.', response.data['non_field_errors'])
+
+        data.update(start_time='01:30', end_time='03:00')
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
     def test_update_session(self):
         session = SessionFactory()
 
@@ -110,6 +297,72 @@ class SessionAPITestCase(APITestCase):
         self.assertIn('Tickets have already been booked for this session!', response.data)
 
 
+class SessionBulkAPITestCase(APITestCase):
+    def setUp(self):
+        self.admin = AdminFactory()
+        self.client.force_authenticate(user=self.admin)
+        self.url = reverse('session-bulk-create')
+        self.film = FilmFactory()
+        self.hall = HallFactory()
+        self.session_data = {
+            'film': self.film.pk,
+            'hall': self.hall.pk,
+            'price': '100.00',
+            'start_time': '10:00',
+            'end_time': '12:00',
+            'start_date': '2024-04-25',
+            'end_date': '2024-04-30'
+        }
+
+    def test_bulk_create(self):
+        data = [
+            {**self.session_data, 'repeat_every': 150, 'repeat_count': 4},
+            {**self.session_data, 'hall': HallFactory().pk},
+        ]
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(
+            list(Session.objects.filter(hall=self.hall).order_by('start_time').values_list('start_time', flat=True)),
+            [time(10), time(12, 30), time(15), time(17, 30)],
+        )
+
+    def test_bulk_create_conflicts(self):
+        SessionFactory(hall=self.hall, start_time='09:00', end_time='10:30', start_date=date(2024, 4, 20), end_date=date(2024, 4, 26))
+        data = [
+            {**self.session_data, 'start_time': '13:00', 'end_time': '15:00'},
+            {**self.session_data, 'start_time': '14:00', 'end_time': '16:00'},
+            self.session_data,
+            {**self.session_data, 'price': '-1'},
+        ]
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Price cannot be negative.', response.data[3]['non_field_errors'])
+
+        response = self.client.post(self.url, data[:3], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertEqual(response.data[1]['non_field_errors'], ['This hall has a session for that time: 13:00-15:00'])
+        self.assertEqual(response.data[2]['non_field_errors'], ['This hall has a session for that time: 09:00-10:30'])
+        self.assertEqual(Session.objects.count(), 1)
+
+
+    def test_bulk_create_overnight_conflicts(self):
+        SessionFactory(hall=self.hall, start_time='23:00', end_time='01:30', start_date=date(2024, 4, 24), end_date=date(2024, 4, 24))
+        data = [
+            {**self.session_data, 'start_time': '01:00', 'end_time': '03:00'},
+            {**self.session_data, 'start_time': '20:00', 'end_time': '00:30', 'start_date': '2024-04-30', 'end_date': '2024-04-30'},
+            {**self.session_data, 'start_time': '00:00', 'end_time': '02:00', 'start_date': '2024-05-01', 'end_date': '2024-05-01'},
+        ]
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0]['non_field_errors'], ['This hall has a session for that time: 23:00-01:30'])
+        self.assertEqual(response.data[1], {})
+        self.assertEqual(response.data[2]['non_field_errors'], ['This hall has a session for that time: 20:00-00:30'])
+
+
 class HallAPITestCase(APITestCase):
     def setUp(self):
         self.admin = AdminFactory()
@@ -185,3 +438,221 @@ class TicketAPITestCase(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
+
+    def test_list_tickets_query_count(self):
+        TicketFactory(user=self.user)
+        url = reverse('ticket-list')
+        params = {'expand': 'session,film,hall'}
+
+        self.client.get(url, params)
+
+        with CaptureQueriesContext(connection) as few_tickets:
+            self.client.get(url, params)
+
+        TicketFactory.create_batch(4, user=self.user)
+
+        with CaptureQueriesContext(connection) as many_tickets:
+            response = self.client.get(url, params)
+
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(response.data[0]['session']['film']['name'], 'Batman')
+        self.assertEqual(len(few_tickets), len(many_tickets))
+
+
+class SeatMapAPITestCase(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        self.session = SessionFactory(hall__size=10, hall__rows=2)
+        self.book_url = reverse('ticket-create', kwargs={'session_pk': self.session.pk, 'date_filter': 'today'})
+        self.map_url = reverse('seat-map', kwargs={'session_pk': self.session.pk, 'date_filter': 'today'})
+
+    def test_book_seats(self):
+        data = {'seats': [{'row': 1, 'seat': 2}, {'row': 2, 'seat': 5}]}
+        response = self.client.post(self.book_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        ticket = Ticket.objects.get()
+        self.assertEqual(ticket.count_of_tickets, 2)
+        self.assertEqual(ticket.seats, [1, 9])
+
+        response = self.client.get(self.map_url)
+        self.assertEqual(response.data['rows'], 2)
+        self.assertEqual(response.data['seats_in_row'], 5)
+        self.assertEqual(response.data['remaining'], 8)
+        self.assertEqual(base64.b64decode(response.data['seat_map']), bytes([0b01000000, 0b01000000]))
+
+        response = self.client.get(reverse('ticket-list'))
+        self.assertEqual(response.data[0]['seats'], [{'row': 1, 'seat': 2}, {'row': 2, 'seat': 5}])
+
+    def test_seat_taken(self):
+        self.client.post(self.book_url, {'seats': [{'row': 1, 'seat': 2}]}, format='json')
+
+        data = {'seats': [{'row': 1, 'seat': 1}, {'row': 1, 'seat': 2}]}
+        response = self.client.post(self.book_url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Some of the selected seats are already taken!', response.data)
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_invalid_seat(self):
+        response = self.client.post(self.book_url, {'seats': [{'row': 3, 'seat': 1}]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('There is no seat 1 in row 3!', response.data)
+
+
+class SeatHoldAPITestCase(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        self.session = SessionFactory()
+        self.url = reverse('hold-create', kwargs={'session_pk': self.session.pk, 'date_filter': 'today'})
+
+    def test_hold_and_confirm(self):
+        response = self.client.post(self.url, {'count_of_tickets': 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsNotNone(response.data['expires_at'])
+
+        response = self.client.post(reverse('hold-confirm', args=[response.data['id']]))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['count_of_tickets'], 2)
+        self.assertEqual(Ticket.objects.filter(user=self.user).count(), 1)
+
+    def test_release_hold(self):
+        response = self.client.post(self.url, {'count_of_tickets': 10}, format='json')
+
+        response = self.client.delete(reverse('hold-delete', args=[response.data['id']]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Session.objects.get(pk=self.session.pk).available_today(), 10)
+
+    def test_confirm_other_users_hold(self):
+        response = self.client.post(self.url, {'count_of_tickets': 2}, format='json')
+        self.client.force_authenticate(user=UserFactory(username='other', email='other@gmail.com'))
+
+        response = self.client.post(reverse('hold-confirm', args=[response.data['id']]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class IdempotencyKeyTestCase(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        self.session = SessionFactory()
+        self.url = reverse('ticket-create', kwargs={'session_pk': self.session.pk, 'date_filter': 'today'})
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_retry_is_replayed(self):
+        first = self.client.post(self.url, {'count_of_tickets': 3}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        retry = self.client.post(self.url, {'count_of_tickets': 3}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Ticket.objects.count(), 1)
+        self.assertEqual(Session.objects.get(pk=self.session.pk).available_today(), 7)
+
+    def test_validation_error_is_replayed(self):
+        self.client.post(self.url, {'count_of_tickets': 11}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+
+        with self.assertNumQueries(0):
+            response = self.client.post(self.url, {'count_of_tickets': 11}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Not enough available seats!', response.data)
+
+    def test_key_reused_for_other_request(self):
+        self.client.post(self.url, {'count_of_tickets': 3}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        response = self.client.post(self.url, {'count_of_tickets': 2}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_request_in_progress(self):
+        cache.add(idempotency_key(self.user.pk, 'abc'), {'fingerprint': ''})
+        response = self.client.post(self.url, {'count_of_tickets': 3}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Ticket.objects.exists())
+
+    @override_settings(IDEMPOTENCY_LOCK_TIMEOUT=1)
+    def test_abandoned_request_expires(self):
+        # What a worker killed mid-request leaves behind
+        cache.add(idempotency_key(self.user.pk, 'abc'), {'fingerprint': ''}, 1)
+        response = self.client.post(self.url, {'count_of_tickets': 3}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        sleep(1.1)
+        response = self.client.post(self.url, {'count_of_tickets': 3}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_without_key(self):
+        self.client.post(self.url, {'count_of_tickets': 3}, format='json')
+        self.client.post(self.url, {'count_of_tickets': 3}, format='json')
+
+        self.assertEqual(Ticket.objects.count(), 2)
+
+
+@override_settings(BOOKING_QUEUED=True)
+class QueuedBookingTestCase(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        self.session = SessionFactory()
+        self.url = reverse('ticket-create', kwargs={'session_pk': self.session.pk, 'date_filter': 'today'})
+
+    def test_queued_booking(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(self.url, {'count_of_tickets': 3}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertEqual(response['Location'], response.data['status_url'])
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(Ticket.objects.exists())
+
+        status_url = response.data['status_url']
+        response = self.client.get(status_url)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertEqual(response['Retry-After'], '1')
+
+        process_booking_requests(self.session.pk, date.today())
+
+        response = self.client.get(status_url)
+        self.assertEqual(response.data['status'], 'booked')
+        self.assertFalse(response.has_header('Retry-After'))
+        self.assertEqual(response.data['ticket'], Ticket.objects.get().pk)
+
+    def test_queued_booking_is_validated(self):
+        response = self.client.post(self.url, {'count_of_tickets': 0}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Count of tickets must be greater than zero!', response.data)
+
+
+class FilmCreateAPITestCase(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(user=AdminFactory())
+        self.url = reverse('film-create')
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def test_create_film_queues_renditions(self):
+        buffer = BytesIO()
+        Image.new('RGB', (600, 800), 'purple').save(buffer, 'PNG')
+        image = SimpleUploadedFile('poster.png', buffer.getvalue(), content_type='image/png')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(self.url, {'name': 'Dune', 'genre': 'sci-fi', 'image': image})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # The schedule cache bump, then the rendition task
+        self.assertEqual(len(callbacks), 2)
+        self.assertEqual(response.data['renditions']['list'], {
+            'src': response.data['image'],
+            'srcset': '',
+            'webp_srcset': '',
+        })
@@ -2,10 +2,16 @@ from rest_framework.authtoken import views
 from django.urls import path, include
 from rest_framework import routers
 from api.views import (
+    SessionBulkCreateView,
     SessionCreateView,
     SessionUpdateView,
     TicketCreateView,
     SessionListView,
+    SeatMapView,
+    SeatHoldCreateView,
+    BookingRequestDetailView,
+    SeatHoldDeleteView,
+    SeatHoldConfirmView,
     FilmCreateView,
     HallCreateView,
     HallUpdateView,
@@ -21,10 +27,16 @@ urlpatterns = [
     path('api-token-auth/', views.obtain_auth_token),
     path('sessions/', SessionListView.as_view(), name='session-list'),
     path('session/create/', SessionCreateView.as_view(), name='session-create'),
+    path('session/bulk-create/', SessionBulkCreateView.as_view(), name='session-bulk-create'),
     path('session/update/<int:pk>/', SessionUpdateView.as_view(), name='session-update'),
     path('film/create/', FilmCreateView.as_view(), name='film-create'),
     path('hall/create/', HallCreateView.as_view(), name='hall-create'),
     path('hall/update/<int:pk>/', HallUpdateView.as_view(), name='hall-update'),
     path('tickets/', TicketListView.as_view(), name='ticket-list'),
     path('sessions/<int:session_pk>/book/<str:date_filter>/', TicketCreateView.as_view(), name='ticket-create'),
+    path('sessions/<int:session_pk>/seats/<str:date_filter>/', SeatMapView.as_view(), name='seat-map'),
+    path('sessions/<int:session_pk>/hold/<str:date_filter>/', SeatHoldCreateView.as_view(), name='hold-create'),
+    path('bookings/<int:pk>/', BookingRequestDetailView.as_view(), name='booking-detail'),
+    path('holds/<int:pk>/', SeatHoldDeleteView.as_view(), name='hold-delete'),
+    path('holds/<int:pk>/confirm/', SeatHoldConfirmView.as_view(), name='hold-confirm'),
 ]
\ No newline at end of file
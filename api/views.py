@@ -1,21 +1,40 @@
 from api.utils import get_and_authenticate_user, create_user_account
 from rest_framework import generics, permissions, viewsets, status
-from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import ImproperlyConfigured, ValidationError as DjangoValidationError
 from django.contrib.auth import get_user_model, logout
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.filters import OrderingFilter
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework import serializers
+from api.pagination import KeysetPagination
+from api.idempotency import IdempotentCreateMixin
+from api.middleware import reset_activity
 from api.filters import SessionFilters
 from datetime import date, timedelta
-from django.db.models import F
+from django.conf import settings
+import base64
+from cinema.services import (
+    book_tickets,
+    booking_queue,
+    confirm_hold,
+    find_schedule_conflicts,
+    hold_seats,
+    materialize_seats,
+    release_holds,
+)
+from cinema.caching import SCHEDULE, bump_version, conditional_listing, get_or_build
+from cinema.tasks import generate_film_renditions, process_bookings
+from django.db import IntegrityError, transaction
 from api.serializers import (
     UserRegisterSerializer,
     CinemaHallSerializer,
     TicketBookSerializer,
+    BookingRequestSerializer,
+    SeatHoldSerializer,
     UserLoginSerializer,
     AuthUserSerializer,
+    SessionBulkSerializer,
     SessionSerializer,
     TicketSerializer,
     EmptySerializer,
@@ -23,7 +42,9 @@ from api.serializers import (
 )
 from cinema.models import (
     AvailableSeats,
+    BookingRequest,
     CinemaHall,
+    SeatHold,
     Session,
     Ticket,
     Film,
@@ -34,10 +55,21 @@ User = get_user_model()
 
 # LIST SESSION(ALL)
 class SessionListView(generics.ListAPIView):
-    queryset = Session.objects.all()
+    queryset = Session.objects.select_related('film', 'hall')
     serializer_class = SessionSerializer
     permission_classes = [permissions.AllowAny]
     filter_backends = [OrderingFilter, SessionFilters]
+    pagination_class = KeysetPagination
+
+    def list(self, request, *args, **kwargs):
+        params = (request.build_absolute_uri(), date.today())
+
+        def build_response():
+            data = get_or_build(SCHEDULE, params, lambda: super(SessionListView, self).list(request, *args, **kwargs).data)
+            return Response(data)
+
+        sessions = self.filter_queryset(self.get_queryset())
+        return conditional_listing(request, SCHEDULE, params, sessions, build_response, related=('film', 'hall'))
 
 
 # CREATE SESSION(ADMIN)
@@ -47,6 +79,47 @@ class SessionCreateView(generics.CreateAPIView):
     permission_classes = [permissions.IsAdminUser]
 
 
+# BULK CREATE SESSIONS(ADMIN)
+class SessionBulkCreateView(generics.GenericAPIView):
+    queryset = Session.objects.all()
+    serializer_class = SessionBulkSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        sessions, entries = [], []
+        for index, data in enumerate(serializer.validated_data):
+            for session in SessionBulkSerializer.build_sessions(data):
+                sessions.append(session)
+                entries.append(index)
+
+        errors = [{} for _ in serializer.validated_data]
+        for session, index, conflict in zip(sessions, entries, find_schedule_conflicts(sessions)):
+            if conflict is not None:
+                errors[index].setdefault('non_field_errors', []).append(
+                    f'This hall has a session for that time: '
+                    f'{conflict.start_time.strftime("%H:%M")}-{conflict.end_time.strftime("%H:%M")}'
+                )
+
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            with transaction.atomic():
+                sessions = Session.objects.bulk_create(sessions)
+                materialize_seats(sessions)
+        except IntegrityError:
+            raise ValidationError('This hall has a session for that time.')
+
+        # bulk_create sends no post_save signals
+        bump_version(SCHEDULE)
+
+        data = SessionSerializer(sessions, many=True, context=self.get_serializer_context()).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
 # UPDATE SESSION(ADMIN)
 class SessionUpdateView(generics.RetrieveUpdateAPIView):
     queryset = Session.objects.all()
@@ -69,6 +142,10 @@ class FilmCreateView(generics.CreateAPIView):
     serializer_class = FilmSerializer
     permission_classes = [permissions.IsAdminUser]
 
+    def perform_create(self, serializer):
+        film = serializer.save()
+        transaction.on_commit(lambda: generate_film_renditions.delay(film.pk))
+
 
 # CREATE HALL(ADMIN)
 class HallCreateView(generics.CreateAPIView):
@@ -93,35 +170,39 @@ class HallUpdateView(generics.RetrieveUpdateAPIView):
         return super().perform_update(serializer)
 
 
-# CREATE TICKET(USER)
-class TicketCreateView(generics.CreateAPIView):
-    queryset = Ticket.objects.all()
-    serializer_class = TicketBookSerializer
-    permission_classes = [permissions.IsAuthenticated]
-
-    def perform_create(self, serializer):
+class BookingMixin:
+    """
+    Reads what to book from the url and the request body: the session, the day
+    ('today' or 'tomorrow'), and either a count or a list of assigned seats.
+    """
+    def get_booking(self, serializer):
         session_pk = self.kwargs['session_pk']
-        session = Session.objects.get(pk=session_pk)
+        session = Session.objects.select_related('hall').get(pk=session_pk)
         count_of_tickets = serializer.validated_data.get('count_of_tickets')
         date_filter = self.kwargs['date_filter']
-        available_seats = session.available_tomorrow() if date_filter == 'tomorrow' else session.available_today()
-        user = self.request.user
+        seats = []
 
         if date_filter != 'tomorrow' and date_filter != 'today':
             raise serializers.ValidationError("Enter correct day in url 'today' or 'tomorrow'")
 
+        # Assigned seats decide the count on their own
+        for seat in serializer.validated_data.get('seats', []):
+            index = session.hall.seat_index(seat['row'], seat['seat'])
+            if index is None:
+                raise serializers.ValidationError(f"There is no seat {seat['seat']} in row {seat['row']}!")
+            if index in seats:
+                raise serializers.ValidationError("Each seat can only be booked once!")
+            seats.append(index)
+
+        if seats:
+            count_of_tickets = len(seats)
+
         if count_of_tickets is None:
             raise serializers.ValidationError("Enter value for 'count_of_tickets'!")
 
         if count_of_tickets <= 0:
             raise serializers.ValidationError("Count of tickets must be greater than zero!")
 
-        if available_seats == 0:
-            raise serializers.ValidationError('All tickets for this session have already been sold!')
-
-        if available_seats < count_of_tickets:
-            raise serializers.ValidationError('Not enough available seats!')
-
         session_date = date.today() + timedelta(days=1) if date_filter == 'tomorrow' else date.today()
 
         if session.start_date > session_date or session.end_date < session_date:
@@ -129,20 +210,153 @@ class TicketCreateView(generics.CreateAPIView):
                 f'There is not session on this date! Available dates {session.start_date} to {session.end_date}'
             )
 
-        available_seats_obj, created = AvailableSeats.objects.get_or_create(session=session, date=session_date)
-        available_seats_obj.occupied_seats += count_of_tickets
-        available_seats_obj.save()
+        return session, count_of_tickets, session_date, seats
 
-        total_price = count_of_tickets * session.price
-        User.objects.filter(pk=user.pk).update(total_spent=F('total_spent') + total_price)
 
-        serializer.save(
-            user=user,
+# CREATE TICKET(USER)
+class TicketCreateView(IdempotentCreateMixin, BookingMixin, generics.CreateAPIView):
+    queryset = Ticket.objects.all()
+    serializer_class = TicketBookSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def create(self, request, *args, **kwargs):
+        if not settings.BOOKING_QUEUED:
+            return super().create(request, *args, **kwargs)
+
+        # Flash sales: hand the booking to the session's queue and let the client poll
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session, count_of_tickets, session_date, seats = self.get_booking(serializer)
+
+        booking = BookingRequest.objects.create(
+            user=request.user,
             session=session,
+            date=session_date,
             count_of_tickets=count_of_tickets,
-            total_price=total_price,
-            data_session=session_date
+            seats=seats,
         )
+        transaction.on_commit(lambda: process_bookings.apply_async(
+            (session.pk, session_date.isoformat()),
+            queue=booking_queue(session.pk),
+        ))
+
+        data = BookingRequestSerializer(booking, context=self.get_serializer_context()).data
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers={'Location': data['status_url']})
+
+    def perform_create(self, serializer):
+        session, count_of_tickets, session_date, seats = self.get_booking(serializer)
+
+        try:
+            serializer.instance = book_tickets(self.request.user, session, count_of_tickets, session_date, seats)
+        except DjangoValidationError as error:
+            raise serializers.ValidationError(error.message)
+
+
+# BOOKING STATUS(USER)
+class BookingRequestDetailView(generics.RetrieveAPIView):
+    """
+    Status of a queued booking. While it is pending the response carries Retry-After,
+    so clients poll at that pace instead of holding a (sync) worker open.
+    """
+    serializer_class = BookingRequestSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    retry_after = 1
+
+    def get_queryset(self):
+        return BookingRequest.objects.filter(user=self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        booking = self.get_object()
+        response = Response(self.get_serializer(booking).data)
+
+        if booking.status == BookingRequest.PENDING:
+            response['Retry-After'] = str(self.retry_after)
+        return response
+
+
+# HOLD SEATS(USER)
+class SeatHoldCreateView(IdempotentCreateMixin, BookingMixin, generics.CreateAPIView):
+    queryset = SeatHold.objects.all()
+    serializer_class = SeatHoldSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def perform_create(self, serializer):
+        session, count_of_tickets, session_date, seats = self.get_booking(serializer)
+
+        try:
+            serializer.instance = hold_seats(self.request.user, session, count_of_tickets, session_date, seats)
+        except DjangoValidationError as error:
+            raise serializers.ValidationError(error.message)
+
+
+# RELEASE HOLD(USER)
+class SeatHoldDeleteView(generics.DestroyAPIView):
+    serializer_class = SeatHoldSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return SeatHold.objects.filter(user=self.request.user)
+
+    def perform_destroy(self, instance):
+        release_holds(SeatHold.objects.filter(pk=instance.pk))
+
+
+# CONFIRM HOLD(USER)
+class SeatHoldConfirmView(generics.GenericAPIView):
+    serializer_class = TicketSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return SeatHold.objects.filter(user=self.request.user).select_related('session__hall', 'user')
+
+    def post(self, request, *args, **kwargs):
+        hold = self.get_object()
+
+        try:
+            ticket = confirm_hold(hold)
+        except DjangoValidationError as error:
+            raise serializers.ValidationError(error.message)
+
+        return Response(self.get_serializer(ticket).data, status=status.HTTP_201_CREATED)
+
+
+# SEAT MAP
+class SeatMapView(generics.GenericAPIView):
+    """
+    Seat occupancy of a session on one day, in one small payload.
+
+    `seat_map` is the occupancy bitmap packed into bytes and base64 encoded: seat
+    index i (row by row, see CinemaHall.seat_index) is taken when bit i is set,
+    most significant bit first. A 500-seat hall fits in 84 characters.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        date_filter = self.kwargs['date_filter']
+
+        if date_filter != 'tomorrow' and date_filter != 'today':
+            raise serializers.ValidationError("Enter correct day in url 'today' or 'tomorrow'")
+
+        session_date = date.today() + timedelta(days=1) if date_filter == 'tomorrow' else date.today()
+        seats = AvailableSeats.objects.filter(
+            session_id=self.kwargs['session_pk'],
+            date=session_date,
+        ).select_related('session__hall').first()
+
+        if seats is None:
+            raise NotFound('There is not session on this date!')
+
+        hall = seats.session.hall
+        bits = seats.seat_map + '0' * (-len(seats.seat_map) % 8)
+        packed = int(bits, 2).to_bytes(len(bits) // 8, 'big') if bits else b''
+
+        return Response({
+            'rows': hall.rows,
+            'seats_in_row': hall.seats_in_row,
+            'size': seats.capacity,
+            'remaining': seats.remaining,
+            'seat_map': base64.b64encode(packed).decode(),
+        })
 
 
 # LIST TICKET(USER)
@@ -151,7 +365,7 @@ class TicketListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Ticket.objects.filter(user=self.request.user)
+        return Ticket.objects.filter(user=self.request.user).select_related('session__film', 'session__hall')
 
 
 # AUTHENTICATION
@@ -170,6 +384,7 @@ class AuthViewSet(viewsets.GenericViewSet):
         serializer.is_valid(raise_exception=True)
         user = get_and_authenticate_user(**serializer.validated_data)
         data = AuthUserSerializer(user).data
+        reset_activity(user, data['auth_token'])
         return Response(data=data, status=status.HTTP_200_OK)
 
     @action(methods=['POST', ], detail=False)
@@ -1,9 +1,22 @@
 from django.contrib import admin  # MiaGames16
+from django.db import transaction
 from cinema import models
+from cinema.tasks import generate_film_renditions
 
 admin.site.register(models.User)
 admin.site.register(models.CinemaHall)
-admin.site.register(models.Film)
 admin.site.register(models.Session)
 admin.site.register(models.Ticket)
-admin.site.register(models.AvailableSeats)
\ No newline at end of file
+admin.site.register(models.AvailableSeats)
+admin.site.register(models.SeatHold)
+admin.site.register(models.SpendingEntry)
+admin.site.register(models.ArchivedSession)
+admin.site.register(models.ArchivedTicket)
+
+
+@admin.register(models.Film)
+class FilmAdmin(admin.ModelAdmin):
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data and obj.image:
+            transaction.on_commit(lambda: generate_film_renditions.delay(obj.pk))
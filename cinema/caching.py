@@ -0,0 +1,136 @@
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.http import http_date
+from datetime import date
+import threading
+import hashlib
+import time
+
+# Cached data is grouped by what it is built from. Changing any model of a group
+# moves the group to a new version, so old entries are simply never read again.
+HALLS = 'halls'
+SCHEDULE = 'schedule'
+
+CACHE_TIMEOUT = 60
+
+_set_lock = threading.Lock()
+
+
+def get_version(group):
+    version = cache.get(f'version:{group}')
+    if version is None:
+        cache.add(f'version:{group}', time.time_ns(), None)
+        version = cache.get(f'version:{group}')
+    return version
+
+
+def bump_version(*groups):
+    def bump():
+        cache.set_many({f'version:{group}': time.time_ns() for group in groups}, None)
+
+    # Bump now for this process, and again after commit so nobody caches pre-commit data
+    bump()
+    transaction.on_commit(bump)
+
+
+def get_or_build(group, params, build, timeout=CACHE_TIMEOUT):
+    digest = hashlib.md5(repr(params).encode()).hexdigest()
+    key = f'{group}:{get_version(group)}:{digest}'
+    return cache.get_or_set(key, build, timeout)
+
+
+def _redis_client(key):
+    backend = caches['default']
+    if isinstance(backend, RedisCache):
+        return backend._cache.get_client(key, write=True)
+    return None
+
+
+def add_to_set(key, *members):
+    """
+    Add string members to a set kept in the cache, atomically: SADD on Redis. The
+    other backends used here are per-process, so a process lock is enough for them.
+    """
+    client = _redis_client(key)
+    if client is not None:
+        client.sadd(cache.make_key(key), *members)
+        return
+
+    with _set_lock:
+        current = cache.get(key, set())
+        if not current.issuperset(members):
+            cache.set(key, current | set(members), None)
+
+
+def remove_from_set(key, *members):
+    client = _redis_client(key)
+    if client is not None:
+        client.srem(cache.make_key(key), *members)
+        return
+
+    with _set_lock:
+        current = cache.get(key, set())
+        if not current.isdisjoint(members):
+            cache.set(key, current - set(members), None)
+
+
+def pop_set(key):
+    """Read and clear a cached set in one step; members added meanwhile are kept for the next call."""
+    client = _redis_client(key)
+    if client is not None:
+        with client.pipeline() as pipe:
+            # MULTI/EXEC, so no SADD can land between the read and the delete
+            pipe.smembers(cache.make_key(key))
+            pipe.delete(cache.make_key(key))
+            members, _ = pipe.execute()
+        return {member.decode() for member in members}
+
+    with _set_lock:
+        members = cache.get(key, set())
+        cache.delete(key)
+    return members
+
+
+def listing_validators(group, queryset, *related):
+    """
+    ETag and Last-Modified (a timestamp) of a listing, from one aggregate query: the row
+    count plus the newest updated_at of the rows and of the `related` rows they show.
+    The count catches deletions, which leave no updated_at behind.
+
+    Deletions and rows with an older updated_at entering a date-filtered listing don't
+    move the newest updated_at, so Last-Modified is also at least the time the group
+    last changed (its version is a timestamp) and the start of today.
+    """
+    fields = ['updated_at', *(f'{name}__updated_at' for name in related)]
+    aggregates = queryset.aggregate(count=Count('pk'), **{field: Max(field) for field in fields})
+
+    stamps = [aggregates[field] for field in fields]
+    etag = hashlib.md5(repr((aggregates['count'], stamps, date.today())).encode()).hexdigest()
+
+    changed = [int(stamp.timestamp()) for stamp in stamps if stamp]
+    changed.append(int(time.mktime(date.today().timetuple())))
+    version = get_version(group)
+    # No version without a cache to keep it in; the ETag still catches every change then
+    if version:
+        changed.append(version // 10 ** 9)
+    return quote_etag(etag), max(changed)
+
+
+def conditional_listing(request, group, params, queryset, build_response, related=()):
+    """
+    Answer If-None-Match/If-Modified-Since with 304 before building the listing at all.
+    The validators are cached in the listing's group, so a warm check costs no query.
+    """
+    etag, last_modified = get_or_build(group, ('validators', params), lambda: listing_validators(group, queryset, *related))
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = build_response()
+
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(last_modified)
+    # Clients keep their copy but check back every time; a 304 is cheap
+    patch_cache_control(response, no_cache=True)
+    return response
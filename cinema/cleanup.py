@@ -0,0 +1,100 @@
+from django.db import connections, transaction
+from .caching import SCHEDULE, bump_version
+from .models import (
+    ArchivedSession,
+    ArchivedTicket,
+    AvailableSeats,
+    BookingRequest,
+    SeatHold,
+    Session,
+    SpendingEntry,
+    Ticket,
+)
+
+SEATS_BATCH_SIZE = 5000
+SESSIONS_BATCH_SIZE = 200
+
+
+def pk_ranges(queryset, batch_size):
+    """
+    Yield (low, high] primary key ranges that each hold up to `batch_size` rows of `queryset`.
+
+    Rows are looked up again for every range, so rows deleted by an earlier run (or an
+    earlier range) are simply not found: a killed run resumes where it stopped.
+    """
+    last = 0
+    while True:
+        pks = list(queryset.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return
+        yield last, pks[-1]
+        last = pks[-1]
+
+
+def copy_rows(queryset, model):
+    """
+    Copy the rows of `queryset` into `model` with one INSERT ... SELECT; both share column names.
+
+    Rows already copied are skipped, so copying a batch twice is harmless. Returns rows copied.
+    """
+    fields = [field.attname for field in model._meta.concrete_fields]
+    connection = connections[queryset.db]
+    sql, params = queryset.order_by().values_list(*fields).query.get_compiler(queryset.db).as_sql()
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in model._meta.concrete_fields)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {connection.ops.quote_name(model._meta.db_table)} ({columns}) {sql} '
+            f'ON CONFLICT DO NOTHING',
+            params,
+        )
+        return cursor.rowcount
+
+
+def delete_expired_seats(today, batch_size=SEATS_BATCH_SIZE):
+    """Delete seats rows of past days, one committed batch per primary key range. Yields rows per batch."""
+    expired = AvailableSeats.objects.filter(date__lt=today)
+
+    for low, high in pk_ranges(expired, batch_size):
+        batch = expired.filter(pk__gt=low, pk__lte=high)
+        # No ORM collector: no SELECT of the rows and no per-row signals
+        with transaction.atomic():
+            deleted = batch._raw_delete(batch.db)
+
+        yield {'AvailableSeats': deleted}
+
+
+def archive_expired_sessions(today, batch_size=SESSIONS_BATCH_SIZE):
+    """
+    Move sessions that ended before `today` and their tickets into the archive tables,
+    then delete them together with everything else hanging off them.
+
+    The cache receivers on Session and AvailableSeats stop Django from fast-deleting,
+    so the cascade is spelled out here as one DELETE per table and batch, children
+    first. Yields rows deleted per table for every batch.
+    """
+    expired = Session.objects.filter(end_date__lt=today)
+
+    for low, high in pk_ranges(expired, batch_size):
+        with transaction.atomic():
+            sessions = expired.filter(pk__gt=low, pk__lte=high)
+            copy_rows(sessions, ArchivedSession)
+            copy_rows(Ticket.objects.filter(session__in=sessions), ArchivedTicket)
+
+            deleted = {}
+            SpendingEntry.objects.filter(ticket__session__in=sessions).update(ticket=None)
+            for model in (BookingRequest, SeatHold, Ticket, AvailableSeats):
+                rows = model.objects.filter(session__in=sessions)
+                deleted[model.__name__] = rows._raw_delete(rows.db)
+            deleted['Session'] = sessions._raw_delete(sessions.db)
+
+        yield deleted
+
+
+def delete_expired(today):
+    """Run both cleanups, yielding per-batch counts; the schedule cache is dropped once at the end."""
+    try:
+        yield from delete_expired_seats(today)
+        yield from archive_expired_sessions(today)
+    finally:
+        bump_version(SCHEDULE)
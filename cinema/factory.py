@@ -85,3 +85,12 @@ class AvailableSeatsFactory(DjangoModelFactory):
     session = factory.SubFactory(SessionFactory)
     date = factory.LazyAttribute(lambda _: date.today())
     occupied_seats = 10
+    capacity = factory.LazyAttribute(lambda seats: seats.session.hall.size)
+    remaining = factory.LazyAttribute(lambda seats: seats.capacity - seats.occupied_seats)
+    seat_map = factory.LazyAttribute(lambda seats: '0' * seats.capacity)
+
+    @classmethod
+    def _create(cls, model_class, session, date, **kwargs):
+        # Rows are materialized together with the session, so fill in the existing one
+        seats, _ = model_class.objects.update_or_create(session=session, date=date, defaults=kwargs)
+        return seats
@@ -0,0 +1,14 @@
+from django.db import models
+
+
+class SeatMapField(models.Field):
+    """
+    Seat occupancy stored as a Postgres bit string, e.g. '0110', one bit per seat in hall order.
+
+    Bit strings support & and | in SQL, so a set of seats can be checked and claimed
+    in a single UPDATE. The Python value is the plain '0'/'1' string.
+    """
+    description = 'Seat occupancy bitmap'
+
+    def db_type(self, connection):
+        return 'varbit'
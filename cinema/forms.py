@@ -50,8 +50,21 @@ class CinemaHallForm(forms.ModelForm):
                 'placeholder': 'Enter Size of Hall',
                 'min': '1',
             }),
+            'rows': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'placeholder': 'Enter Number of Rows',
+                'min': '1',
+            }),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['rows'].required = False
+
+    def clean_rows(self):
+        # Halls without a layout are one long row
+        return self.cleaned_data.get('rows') or 1
+
 
 class SessionForm(forms.ModelForm):
     class Meta:
@@ -95,26 +108,11 @@ class SessionForm(forms.ModelForm):
     def clean(self):
         cleaned_data = super().clean()
 
-        hall = cleaned_data.get('hall')
         start_date = cleaned_data.get('start_date')
         end_date = cleaned_data.get('end_date')
-        start_time = cleaned_data.get('start_time')
-        end_time = cleaned_data.get('end_time')
         price = cleaned_data.get('price')
 
-        session = Session.objects.filter(
-            hall=hall,
-            start_date__lte=end_date,
-            end_date__gte=start_date,
-            start_time__lte=end_time,
-            end_time__gte=start_time,
-        ).exclude(pk=self.instance.pk)
-
-        if session.exists():
-            times = session.values_list('start_time', 'end_time')
-            times_string = [f'{str(start_time)[:-3]}-{str(end_time)[:-3]}'
-                            for start_time, end_time in times]
-            raise ValidationError(f"This hall has a session for that time: {times_string[0]}")
+        # Hall overlaps are checked by Session's exclusion constraint during model validation
 
         if start_date > end_date:
             raise ValidationError("Start date must be before end date.")
@@ -0,0 +1,62 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from cinema.caching import SCHEDULE, bump_version
+from cinema.models import Film
+
+
+class Command(BaseCommand):
+    help = 'Rename film posters to content-hash names, drop duplicate files and point Film.image at the survivors.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would change.')
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        directory = Film._meta.get_field('image').upload_to
+        _, filenames = storage.listdir(directory)
+
+        # Old name -> content-hash name, for every file in the poster directory
+        renamed, sizes = {}, {}
+        for filename in filenames:
+            name = f'{directory}{filename}'
+            sizes[name] = storage.size(name)
+            with storage.open(name) as content:
+                renamed[name] = storage.hashed_name(name, content)
+
+        stale = {name: hashed for name, hashed in renamed.items() if name != hashed}
+        # One copy of every blob that is not stored under its hash yet stays behind
+        kept = {hashed: sizes[name] for name, hashed in stale.items() if hashed not in renamed}
+        freed = sum(sizes[name] for name in stale) - sum(kept.values())
+        films = [film for film in Film.objects.only('pk', 'image', 'renditions', 'updated_at') if film.image.name in stale]
+
+        self.stdout.write(
+            f'{len(stale)} files to rename into {len(set(stale.values()))} blobs, '
+            f'{freed} bytes freed, {len(films)} films to update.'
+        )
+        if options['dry_run'] or not stale:
+            return
+
+        for name, hashed in stale.items():
+            if not storage.exists(hashed):
+                with storage.open(name) as content:
+                    storage.save(name, content)
+
+        now = timezone.now()
+        with transaction.atomic():
+            for film in films:
+                hashed = stale[film.image.name]
+                # Renditions were cut from the same bytes; keep them valid for the new name
+                if film.renditions.get('source') == film.image.name:
+                    film.renditions['source'] = hashed
+                film.image.name = hashed
+                film.updated_at = now
+            Film.objects.bulk_update(films, ['image', 'renditions', 'updated_at'], batch_size=500)
+            bump_version(SCHEDULE)
+
+        # Only after the films point at the hashed copies
+        for name in stale:
+            storage.delete(name)
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully deduplicated {len(stale)} files'))
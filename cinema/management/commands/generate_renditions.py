@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from cinema.models import Film
+from cinema.tasks import generate_film_renditions
+
+
+class Command(BaseCommand):
+    help = 'Generate poster renditions for films that have none yet, e.g. posters uploaded before the pipeline existed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regenerate renditions of every film.')
+
+    def handle(self, *args, **options):
+        films = Film.objects.exclude(image='').only('pk', 'image', 'renditions')
+        if not options['all']:
+            films = [film for film in films if film.renditions.get('source') != film.image.name]
+
+        for film in films:
+            self.stdout.write(generate_film_renditions(film.pk))
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully generated renditions for {len(films)} films'))
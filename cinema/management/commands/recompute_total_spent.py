@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from cinema.models import ArchivedTicket, SpendingEntry, Ticket
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Recompute User.total_spent from live and archived tickets in bulk and report users whose stored total drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the drift, change nothing.')
+
+    def handle(self, *args, **options):
+        money = DecimalField(decimal_places=2, max_digits=12)
+        tickets = Ticket.objects.filter(user=OuterRef('pk')).values('user').annotate(
+            total=Sum('total_price'),
+        ).values('total')
+        archived = ArchivedTicket.objects.filter(user=OuterRef('pk')).values('user').annotate(
+            total=Sum('total_price'),
+        ).values('total')
+        pending = SpendingEntry.objects.filter(user=OuterRef('pk'), aggregated=False).values('user').annotate(
+            total=Sum('amount'),
+        ).values('total')
+
+        # Ledger entries not aggregated yet are already in the ticket sum; leave room for them
+        expected = (
+            Coalesce(Subquery(tickets), Value(0), output_field=money)
+            + Coalesce(Subquery(archived), Value(0), output_field=money)
+            - Coalesce(Subquery(pending), Value(0), output_field=money)
+        )
+        drifted = list(User.objects.annotate(expected=expected).exclude(
+            total_spent=F('expected'),
+        ).values_list('pk', 'username', 'total_spent', 'expected'))
+
+        for _, username, total_spent, user_expected in drifted:
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{username}: stored {total_spent}, expected {user_expected}')
+
+        drift = sum(abs(total_spent - user_expected) for _, _, total_spent, user_expected in drifted)
+        self.stdout.write(f'{len(drifted)} users drifted by {drift} in total.')
+
+        if options['dry_run'] or not drifted:
+            return
+
+        User.objects.filter(pk__in=[pk for pk, _, _, _ in drifted]).update(total_spent=expected)
+        self.stdout.write(self.style.SUCCESS(f'Successfully recomputed total spent for {len(drifted)} users'))
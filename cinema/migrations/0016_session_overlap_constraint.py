@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-18 06:52
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+from django.db import migrations, models
+import django.db.models.functions.comparison
+import django.db.models.functions.datetime
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0015_alter_session_end_time_alter_session_start_time'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='session',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(expressions=[(models.Func('hall', 'hall', models.Value('[]'), function='int8range', output_field=django.contrib.postgres.fields.ranges.BigIntegerRangeField()), '&&'), (models.Func(django.db.models.functions.comparison.Least('start_date', 'end_date'), django.db.models.functions.comparison.Greatest('start_date', 'end_date'), models.Value('[]'), function='daterange', output_field=django.contrib.postgres.fields.ranges.DateRangeField()), '&&'), (models.Func(django.db.models.functions.comparison.Least(django.db.models.functions.datetime.Extract('start_time', 'epoch'), django.db.models.functions.datetime.Extract('end_time', 'epoch')), django.db.models.functions.comparison.Greatest(django.db.models.functions.datetime.Extract('start_time', 'epoch'), django.db.models.functions.datetime.Extract('end_time', 'epoch')), models.Value('[]'), function='numrange', output_field=django.contrib.postgres.fields.ranges.DecimalRangeField()), '&&')], name='exclude_overlapping_sessions', violation_error_message='This hall has a session for that time.'),
+        ),
+    ]
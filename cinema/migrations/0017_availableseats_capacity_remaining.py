@@ -0,0 +1,54 @@
+# Generated by Django 4.2 on 2026-10-18 09:40
+
+from datetime import date, timedelta
+from django.db import migrations, models
+from django.db.models.functions import Greatest
+
+
+def materialize_seats(apps, schema_editor):
+    AvailableSeats = apps.get_model('cinema', 'AvailableSeats')
+    Session = apps.get_model('cinema', 'Session')
+
+    hall_size = models.Subquery(
+        Session.objects.filter(pk=models.OuterRef('session_id')).values('hall__size')[:1],
+    )
+    AvailableSeats.objects.update(capacity=hall_size)
+    AvailableSeats.objects.update(remaining=Greatest(models.F('capacity') - models.F('occupied_seats'), 0))
+
+    today = date.today()
+    seats = []
+    for session in Session.objects.filter(end_date__gte=today).select_related('hall').iterator():
+        day = max(session.start_date, today)
+        while day <= session.end_date:
+            seats.append(AvailableSeats(
+                session=session,
+                date=day,
+                capacity=session.hall.size,
+                remaining=session.hall.size,
+            ))
+            day += timedelta(days=1)
+
+    AvailableSeats.objects.bulk_create(seats, ignore_conflicts=True, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0016_session_overlap_constraint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='availableseats',
+            name='capacity',
+            field=models.PositiveIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='availableseats',
+            name='remaining',
+            field=models.PositiveIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.RunPython(materialize_seats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2 on 2026-10-18 10:25
+
+import cinema.fields
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0017_availableseats_capacity_remaining'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cinemahall',
+            name='rows',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddConstraint(
+            model_name='cinemahall',
+            constraint=models.CheckConstraint(
+                check=models.Q(('rows__gte', 1), ('rows__lte', models.F('size'))),
+                name='hall_rows_within_size',
+                violation_error_message='Number of rows must be between 1 and the hall size.',
+            ),
+        ),
+        migrations.AddField(
+            model_name='availableseats',
+            name='seat_map',
+            field=cinema.fields.SeatMapField(default=''),
+            preserve_default=False,
+        ),
+        migrations.RunSQL(
+            "UPDATE cinema_availableseats SET seat_map = repeat('0', capacity)::varbit",
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='seats',
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.PositiveIntegerField(), blank=True, default=list, size=None,
+            ),
+        ),
+    ]
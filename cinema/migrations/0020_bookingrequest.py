@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-18 07:25
+
+import datetime
+from django.conf import settings
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0019_seathold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(default=datetime.date.today)),
+                ('count_of_tickets', models.PositiveIntegerField(default=1)),
+                ('seats', django.contrib.postgres.fields.ArrayField(base_field=models.PositiveIntegerField(), blank=True, default=list, size=None)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('booked', 'Booked'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('error', models.CharField(blank=True, max_length=200)),
+                ('data_creation', models.DateTimeField(auto_now_add=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cinema.session')),
+                ('ticket', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='cinema.ticket')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='bookingrequest',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['session', 'date'], name='pending_booking_requests'),
+        ),
+    ]
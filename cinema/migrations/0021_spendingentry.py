@@ -0,0 +1,30 @@
+# Generated by Django 4.2 on 2026-10-18 07:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0020_bookingrequest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendingEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('aggregated', models.BooleanField(default=False)),
+                ('data_creation', models.DateTimeField(auto_now_add=True)),
+                ('ticket', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='cinema.ticket')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='spendingentry',
+            index=models.Index(condition=models.Q(('aggregated', False)), fields=['user'], name='unaggregated_spending'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-18 07:31
+
+from django.conf import settings
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0021_spendingentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedSession',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('film', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_sessions', to='cinema.film')),
+                ('hall', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_sessions', to='cinema.cinemahall')),
+            ],
+            options={
+                'ordering': ['start_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedTicket',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('count_of_tickets', models.PositiveIntegerField(default=1)),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('data_session', models.DateField()),
+                ('data_creation', models.DateTimeField()),
+                ('seats', django.contrib.postgres.fields.ArrayField(base_field=models.PositiveIntegerField(), blank=True, default=list, size=None)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tickets', to='cinema.archivedsession')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_tickets', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-data_creation'],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-18 07:33
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Built without locking writes on the session and ticket tables
+    atomic = False
+
+    dependencies = [
+        ('cinema', '0022_archivedsession_archivedticket'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='archivedticket',
+            index=models.Index(fields=['user', '-data_creation'], name='archived_ticket_user_recent'),
+        ),
+        AddIndexConcurrently(
+            model_name='session',
+            index=models.Index(fields=['start_date', 'start_time', 'id'], name='session_schedule'),
+        ),
+        AddIndexConcurrently(
+            model_name='session',
+            index=models.Index(fields=['end_date', 'start_date'], name='session_dates'),
+        ),
+        AddIndexConcurrently(
+            model_name='session',
+            index=models.Index(fields=['start_time', 'id'], name='session_start_time'),
+        ),
+        AddIndexConcurrently(
+            model_name='ticket',
+            index=models.Index(fields=['user', '-data_creation'], name='ticket_user_recent'),
+        ),
+    ]
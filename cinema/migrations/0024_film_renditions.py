@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 07:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0023_schedule_and_ticket_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='film',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
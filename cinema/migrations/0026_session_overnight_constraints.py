@@ -0,0 +1,30 @@
+# Generated by Django 4.2 on 2026-10-18 08:01
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+from django.db import migrations, models
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.functions.datetime
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0025_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='session',
+            name='exclude_overlapping_sessions',
+        ),
+        migrations.AddConstraint(
+            model_name='session',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(expressions=[(models.Func('hall', 'hall', models.Value('[]'), function='int8range', output_field=django.contrib.postgres.fields.ranges.BigIntegerRangeField()), '&&'), (models.Func(django.db.models.functions.comparison.Least('start_date', 'end_date'), django.db.models.functions.comparison.Greatest('start_date', 'end_date'), models.Value('[]'), function='daterange', output_field=django.contrib.postgres.fields.ranges.DateRangeField()), '&&'), (models.Func(django.db.models.functions.datetime.Extract('start_time', 'epoch'), models.Case(models.When(models.Func('start_time', 'end_time', arg_joiner=' > ', output_field=models.BooleanField(), template='%(expressions)s'), then=django.db.models.expressions.CombinedExpression(django.db.models.functions.datetime.Extract('end_time', 'epoch'), '+', models.Value(86400))), default=django.db.models.functions.datetime.Extract('end_time', 'epoch')), models.Value('[]'), function='numrange', output_field=django.contrib.postgres.fields.ranges.DecimalRangeField()), '&&')], name='exclude_overlapping_sessions', violation_error_message='This hall has a session for that time.'),
+        ),
+        migrations.AddConstraint(
+            model_name='session',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(expressions=[(models.Func('hall', 'hall', models.Value('[]'), function='int8range', output_field=django.contrib.postgres.fields.ranges.BigIntegerRangeField()), '&&'), (models.Func(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Least('start_date', 'end_date'), '+', models.Case(models.When(models.Func('start_time', 'end_time', arg_joiner=' > ', output_field=models.BooleanField(), template='%(expressions)s'), then=models.Value(1)), default=models.Value(0)), output_field=models.DateField()), django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Greatest('start_date', 'end_date'), '+', models.Case(models.When(models.Func('start_time', 'end_time', arg_joiner=' > ', output_field=models.BooleanField(), template='%(expressions)s'), then=models.Value(1)), default=models.Value(0)), output_field=models.DateField()), models.Value('[]'), function='daterange', output_field=django.contrib.postgres.fields.ranges.DateRangeField()), '&&'), (models.Func(models.Case(models.When(models.Func('start_time', 'end_time', arg_joiner=' > ', output_field=models.BooleanField(), template='%(expressions)s'), then=models.Value(0)), default=django.db.models.functions.datetime.Extract('start_time', 'epoch')), django.db.models.functions.datetime.Extract('end_time', 'epoch'), models.Value('[]'), function='numrange', output_field=django.contrib.postgres.fields.ranges.DecimalRangeField()), '&&')], name='exclude_overlapping_sessions_after_midnight', violation_error_message='This hall has a session for that time.'),
+        ),
+    ]
@@ -1,6 +1,13 @@
+from django.contrib.postgres.fields import ArrayField, BigIntegerRangeField, DateRangeField, DecimalRangeField, RangeOperators
+from django.contrib.postgres.constraints import ExclusionConstraint
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ValidationError
 from datetime import datetime, date, timedelta
+from django.db.models.functions import Coalesce, Extract, Greatest, Least
+from django.db.models.expressions import CombinedExpression
 from django.db import models
+from math import ceil
+from .fields import SeatMapField
 
 
 class User(AbstractUser):
@@ -14,20 +21,107 @@ class User(AbstractUser):
 class CinemaHall(models.Model):
     name = models.CharField(max_length=100)
     size = models.PositiveIntegerField()
+    rows = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(rows__gte=1, rows__lte=models.F('size')),
+                name='hall_rows_within_size',
+                violation_error_message='Number of rows must be between 1 and the hall size.',
+            ),
+        ]
+
+    @property
+    def seats_in_row(self):
+        # Seats are spread evenly, the last row takes what is left
+        return ceil(self.size / self.rows)
+
+    def seat_index(self, row, seat):
+        """Position of a seat (both numbered from 1) in the seat map, or None if there is no such seat."""
+        index = (row - 1) * self.seats_in_row + seat - 1
+        if 1 <= row <= self.rows and 1 <= seat <= self.seats_in_row and index < self.size:
+            return index
+        return None
+
+    def seat_position(self, index):
+        row, seat = divmod(index, self.seats_in_row)
+        return row + 1, seat + 1
+
 
 class Film(models.Model):
     name = models.CharField(max_length=100)
     genre = models.TextField()
     image = models.ImageField(upload_to='images/')
+    # Resized posters written by the generate_film_renditions task, see cinema/renditions.py
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
 
+def session_hall():
+    # [hall, hall] && [other, other] means the same hall, without needing the btree_gist extension
+    return models.Func(
+        'hall', 'hall', models.Value('[]'),
+        function='int8range', output_field=BigIntegerRangeField(),
+    )
+
+
+def overnight():
+    # An end before the start means the show runs past midnight into the next day
+    return models.Func(
+        'start_time', 'end_time',
+        template='%(expressions)s', arg_joiner=' > ', output_field=models.BooleanField(),
+    )
+
+
+# Date bounds go through Least/Greatest so an inverted input reaches form validation
+# instead of failing inside daterange() with a DataError.
+def session_dates(after_midnight=False):
+    start, end = Least('start_date', 'end_date'), Greatest('start_date', 'end_date')
+    if after_midnight:
+        shift = models.Case(models.When(overnight(), then=models.Value(1)), default=models.Value(0))
+        start = CombinedExpression(start, '+', shift, output_field=models.DateField())
+        end = CombinedExpression(end, '+', shift, output_field=models.DateField())
+    return models.Func(
+        start, end, models.Value('[]'),
+        function='daterange', output_field=DateRangeField(),
+    )
+
+
+def session_times(after_midnight=False):
+    """
+    Daily time range of a session, in seconds since midnight; Postgres has no built-in
+    time range. An overnight show is compared twice: up to its end on a 48 hour clock,
+    and from midnight on the following day, against sessions that start after midnight.
+    """
+    start, end = Extract('start_time', 'epoch'), Extract('end_time', 'epoch')
+    if after_midnight:
+        start = models.Case(models.When(overnight(), then=models.Value(0)), default=start)
+    else:
+        end = models.Case(models.When(overnight(), then=end + models.Value(24 * 60 * 60)), default=end)
+    return models.Func(
+        start, end, models.Value('[]'),
+        function='numrange', output_field=DecimalRangeField(),
+    )
+
+
+class SessionQuerySet(models.QuerySet):
+    def with_available_seats(self, date):
+        # LEFT JOIN the seats row for that date; rows only exist for show dates from today on.
+        return self.annotate(
+            seats_on_date=models.FilteredRelation('availableseats', condition=models.Q(availableseats__date=date)),
+        ).annotate(
+            available_seats=Coalesce('seats_on_date__remaining', 'hall__size'),
+        )
+
+
 class Session(models.Model):
     film = models.ForeignKey(Film, on_delete=models.CASCADE, related_name='session_film')
     hall = models.ForeignKey(CinemaHall, on_delete=models.CASCADE, related_name='session_hall')
@@ -36,16 +130,56 @@ class Session(models.Model):
     end_time = models.TimeField(default=datetime.now().strftime("%H:%M"))
     start_date = models.DateField(default=date.today)
     end_date = models.DateField(default=date.today)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = SessionQuerySet.as_manager()
 
     def __str__(self):
         return f'{self.film.name} from {self.start_date.strftime("%d")} to {self.end_date.strftime("%d, %Y")}'
 
     class Meta:
         ordering = ['start_date']
+        indexes = [
+            # Shows on a date: start_date <= day <= end_date, whichever bound is more selective
+            models.Index(fields=['start_date', 'start_time', 'id'], name='session_schedule'),
+            models.Index(fields=['end_date', 'start_date'], name='session_dates'),
+            # Schedule page order and its keyset cursor
+            models.Index(fields=['start_time', 'id'], name='session_start_time'),
+        ]
+        constraints = [
+            ExclusionConstraint(
+                name='exclude_overlapping_sessions',
+                expressions=[
+                    (session_hall(), RangeOperators.OVERLAPS),
+                    (session_dates(), RangeOperators.OVERLAPS),
+                    (session_times(), RangeOperators.OVERLAPS),
+                ],
+                violation_error_message='This hall has a session for that time.',
+            ),
+            ExclusionConstraint(
+                name='exclude_overlapping_sessions_after_midnight',
+                expressions=[
+                    (session_hall(), RangeOperators.OVERLAPS),
+                    (session_dates(after_midnight=True), RangeOperators.OVERLAPS),
+                    (session_times(after_midnight=True), RangeOperators.OVERLAPS),
+                ],
+                violation_error_message='This hall has a session for that time.',
+            ),
+        ]
+
+    def validate_constraints(self, exclude=None):
+        try:
+            super().validate_constraints(exclude)
+        except ValidationError as error:
+            # Both overlap constraints reject a clash between ordinary sessions; report it once
+            raise ValidationError({field: list(dict.fromkeys(messages)) for field, messages in error.message_dict.items()})
 
     def create_available(self, date):
-        available_seats_obj, created = AvailableSeats.objects.get_or_create(session=self, date=date)
-        return self.hall.size - available_seats_obj.occupied_seats
+        remaining = AvailableSeats.objects.filter(
+            session=self,
+            date=date,
+        ).values_list('remaining', flat=True).first()
+        return self.hall.size if remaining is None else remaining
 
     def available_today(self):
         today = date.today()
@@ -63,21 +197,127 @@ class Ticket(models.Model):
     total_price = models.DecimalField(decimal_places=2, max_digits=12)
     data_session = models.DateField(default=date.today)
     data_creation = models.DateTimeField(auto_now=True)
+    seats = ArrayField(models.PositiveIntegerField(), default=list, blank=True)
 
     def __str__(self):
         return f'{self.user.username} - {self.session.hall.name} - {self.session.start_time.strftime("%H:%M")}'
 
     class Meta:
         ordering = ['-data_creation']
+        indexes = [
+            models.Index(fields=['user', '-data_creation'], name='ticket_user_recent'),
+        ]
 
 
 class AvailableSeats(models.Model):
     session = models.ForeignKey(Session, on_delete=models.CASCADE)
     date = models.DateField(default=date.today)
     occupied_seats = models.PositiveIntegerField(default=0)
+    capacity = models.PositiveIntegerField()
+    remaining = models.PositiveIntegerField()
+    seat_map = SeatMapField()
 
     def __str__(self):
         return f"{self.session} - {self.date}"
 
     class Meta:
-        unique_together = ('session', 'date')
\ No newline at end of file
+        unique_together = ('session', 'date')
+
+
+class SeatHold(models.Model):
+    """Seats set aside during checkout; already taken out of AvailableSeats.remaining."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    session = models.ForeignKey(Session, on_delete=models.CASCADE)
+    date = models.DateField(default=date.today)
+    count_of_tickets = models.PositiveIntegerField(default=1)
+    seats = ArrayField(models.PositiveIntegerField(), default=list, blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.session} - {self.date}"
+
+
+class BookingRequest(models.Model):
+    """A booking waiting in the per-session queue; clients poll it until it is booked or failed."""
+    PENDING = 'pending'
+    BOOKED = 'booked'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (BOOKED, 'Booked'),
+        (FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    session = models.ForeignKey(Session, on_delete=models.CASCADE)
+    date = models.DateField(default=date.today)
+    count_of_tickets = models.PositiveIntegerField(default=1)
+    seats = ArrayField(models.PositiveIntegerField(), default=list, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    ticket = models.OneToOneField(Ticket, on_delete=models.SET_NULL, null=True, blank=True)
+    error = models.CharField(max_length=200, blank=True)
+    data_creation = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.session} - {self.status}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['session', 'date'], condition=models.Q(status='pending'), name='pending_booking_requests'),
+        ]
+
+
+class SpendingEntry(models.Model):
+    """Append-only record of a purchase; folded into User.total_spent in batches."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    ticket = models.ForeignKey(Ticket, on_delete=models.SET_NULL, null=True, blank=True)
+    amount = models.DecimalField(decimal_places=2, max_digits=12)
+    aggregated = models.BooleanField(default=False)
+    data_creation = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.amount}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user'], condition=models.Q(aggregated=False), name='unaggregated_spending'),
+        ]
+
+
+class ArchivedSession(models.Model):
+    """A session that ended, moved out of Session by the nightly cleanup; keeps the original id."""
+    id = models.BigIntegerField(primary_key=True)
+    film = models.ForeignKey(Film, on_delete=models.CASCADE, related_name='archived_sessions')
+    hall = models.ForeignKey(CinemaHall, on_delete=models.CASCADE, related_name='archived_sessions')
+    price = models.DecimalField(decimal_places=2, max_digits=12)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    start_date = models.DateField()
+    end_date = models.DateField()
+
+    def __str__(self):
+        return f'{self.film.name} from {self.start_date.strftime("%d")} to {self.end_date.strftime("%d, %Y")}'
+
+    class Meta:
+        ordering = ['start_date']
+
+
+class ArchivedTicket(models.Model):
+    """A ticket of an archived session; same columns as Ticket, so history reads like live tickets."""
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_tickets')
+    session = models.ForeignKey(ArchivedSession, on_delete=models.CASCADE, related_name='tickets')
+    count_of_tickets = models.PositiveIntegerField(default=1)
+    total_price = models.DecimalField(decimal_places=2, max_digits=12)
+    data_session = models.DateField()
+    data_creation = models.DateTimeField()
+    seats = ArrayField(models.PositiveIntegerField(), default=list, blank=True)
+
+    def __str__(self):
+        return f'{self.user.username} - {self.session.hall.name} - {self.session.start_time.strftime("%H:%M")}'
+
+    class Meta:
+        ordering = ['-data_creation']
+        indexes = [
+            models.Index(fields=['user', '-data_creation'], name='archived_ticket_user_recent'),
+        ]
@@ -0,0 +1,81 @@
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+from io import BytesIO
+import os
+
+# Name -> CSS box (width, height) the poster is shown in; see .session-image and .session-image-v2
+RENDITIONS = {
+    'list': (150, 200),
+    'detail': (300, 400),
+}
+DENSITIES = (1, 2)
+FORMATS = {
+    'jpeg': {'format': 'JPEG', 'quality': 80, 'optimize': True, 'progressive': True},
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 6},
+}
+
+
+def rendition_path(film, name, density, fmt):
+    stem = os.path.splitext(os.path.basename(film.image.name))[0]
+    return f'renditions/films/{film.pk}/{stem}-{name}-{density}x.{"jpg" if fmt == "jpeg" else fmt}'
+
+
+def rendition_paths(renditions):
+    return {path for name in RENDITIONS for paths in renditions.get(name, {}).values() for path in paths}
+
+
+def delete_renditions(storage, paths):
+    for path in paths:
+        storage.delete(path)
+
+
+def generate_renditions(film):
+    """
+    Render every poster size at 1x and 2x as JPEG and WebP, cropped to cover the box the
+    way object-fit: cover does. Returns the paths, keyed like Film.renditions; the files
+    of the previous renditions are left to the caller.
+    """
+    storage = film.image.storage
+
+    with film.image.open('rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image = image.convert('RGB')
+
+    renditions = {'source': film.image.name}
+    for name, (width, height) in RENDITIONS.items():
+        renditions[name] = {}
+        for fmt, options in FORMATS.items():
+            paths = []
+            for density in DENSITIES:
+                resized = ImageOps.fit(image, (width * density, height * density), Image.LANCZOS)
+                buffer = BytesIO()
+                resized.save(buffer, **options)
+
+                path = rendition_path(film, name, density, fmt)
+                paths.append(storage.save(path, ContentFile(buffer.getvalue())))
+            renditions[name][fmt] = paths
+
+    return renditions
+
+
+def poster_sources(film, name, build_url=None):
+    """
+    src/srcset attributes for a poster rendition; falls back to the original upload while
+    the renditions are still being generated.
+    """
+    build_url = build_url or (lambda url: url)
+    paths = film.renditions.get(name) if film.renditions.get('source') == film.image.name else None
+
+    if not paths:
+        return {'src': build_url(film.image.url), 'srcset': '', 'webp_srcset': ''}
+
+    url = film.image.storage.url
+
+    def srcset(fmt):
+        return ', '.join(f'{build_url(url(path))} {density}x' for path, density in zip(paths[fmt], DENSITIES))
+
+    return {
+        'src': build_url(url(paths['jpeg'][0])),
+        'srcset': srcset('jpeg'),
+        'webp_srcset': srcset('webp'),
+    }
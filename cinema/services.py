@@ -0,0 +1,405 @@
+from django.core.exceptions import ValidationError
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import Case, DecimalField, F, Func, Sum, Value, When
+from django.db.models.expressions import CombinedExpression
+from django.db.models.functions import Coalesce, Greatest, Length
+from django.db.models.lookups import Exact
+from datetime import date, timedelta
+from collections import defaultdict
+from .caching import SCHEDULE, bump_version
+from .fields import SeatMapField
+from .models import AvailableSeats, BookingRequest, SeatHold, Session, SpendingEntry, Ticket
+
+User = get_user_model()
+
+
+def claim_seats(session, session_date, count_of_tickets, seats=(), **changes):
+    """
+    Take seats out of `remaining` with a single conditional UPDATE.
+
+    Concurrent claims can never oversell the hall. With `seats` (indexes into the
+    seat map) the same UPDATE also checks that none of them is taken and sets their
+    bits, so two buyers can't get the same seat. `changes` are applied to the row
+    together with the claim.
+    """
+    seats_on_date = AvailableSeats.objects.filter(session=session, date=session_date)
+    claimed = seats_on_date.filter(remaining__gte=count_of_tickets)
+
+    if seats:
+        size = session.hall.size
+        if any(not 0 <= index < size for index in seats):
+            raise ValidationError('Some of the selected seats do not exist!')
+
+        mask = seat_mask(size, seats)
+        claimed = claimed.alias(taken=seat_map_and(mask, size)).filter(taken=seat_mask(size, ()))
+        changes['seat_map'] = seat_map_or(mask)
+
+    changes['remaining'] = F('remaining') - count_of_tickets
+    if claimed.update(**changes):
+        return
+
+    # Seats of abandoned checkouts may only be waiting for the sweep
+    expired = SeatHold.objects.filter(session=session, date=session_date, expires_at__lte=timezone.now())
+    if release_holds(expired) and claimed.update(**changes):
+        return
+
+    current = seats_on_date.values('remaining', 'seat_map').first()
+
+    if not current or not current['remaining']:
+        raise ValidationError('All tickets for this session have already been sold!')
+    if seats and len(current['seat_map']) != session.hall.size:
+        raise ValidationError('The seats of this hall have changed, please choose your seats again!')
+    if seats and any(current['seat_map'][index] == '1' for index in seats):
+        raise ValidationError('Some of the selected seats are already taken!')
+    raise ValidationError('Not enough available seats!')
+
+
+def sell_tickets(user, session, count_of_tickets, session_date, seats=()):
+    total_price = count_of_tickets * session.price
+
+    ticket = Ticket.objects.create(
+        user=user,
+        session=session,
+        count_of_tickets=count_of_tickets,
+        total_price=total_price,
+        data_session=session_date,
+        seats=list(seats),
+    )
+    # Appending to the ledger keeps the user row out of the booking transaction
+    SpendingEntry.objects.create(user=user, ticket=ticket, amount=total_price)
+    return ticket
+
+
+def book_tickets(user, session, count_of_tickets, session_date, seats=()):
+    """
+    Reserve seats, create the ticket and charge the user in one transaction.
+    """
+    with transaction.atomic():
+        claim_seats(
+            session, session_date, count_of_tickets, seats,
+            occupied_seats=F('occupied_seats') + count_of_tickets,
+        )
+        ticket = sell_tickets(user, session, count_of_tickets, session_date, seats)
+
+    # Seats are changed with UPDATE, which sends no signals
+    bump_version(SCHEDULE)
+
+    return ticket
+
+
+def hold_seats(user, session, count_of_tickets, session_date, seats=()):
+    """
+    Set seats aside for SEAT_HOLD_TIMEOUT seconds while the user checks out.
+
+    The seats leave `remaining` right away, so the hold costs one short UPDATE and
+    nobody else can buy them; confirm_hold turns the hold into a ticket.
+    """
+    with transaction.atomic():
+        claim_seats(session, session_date, count_of_tickets, seats)
+        hold = SeatHold.objects.create(
+            user=user,
+            session=session,
+            date=session_date,
+            count_of_tickets=count_of_tickets,
+            seats=list(seats),
+            expires_at=timezone.now() + timedelta(seconds=settings.SEAT_HOLD_TIMEOUT),
+        )
+
+    bump_version(SCHEDULE)
+    return hold
+
+
+def confirm_hold(hold):
+    with transaction.atomic():
+        # Deleting first makes a racing release (or a second confirm) find nothing to do
+        deleted, _ = SeatHold.objects.filter(pk=hold.pk, expires_at__gt=timezone.now()).delete()
+        if not deleted:
+            raise ValidationError('Your hold has expired!')
+
+        AvailableSeats.objects.filter(session=hold.session_id, date=hold.date).update(
+            occupied_seats=F('occupied_seats') + hold.count_of_tickets,
+        )
+        ticket = sell_tickets(hold.user, hold.session, hold.count_of_tickets, hold.date, hold.seats)
+
+    return ticket
+
+
+def booking_queue(session_pk):
+    # A session always lands on the same queue, and each queue has a single worker
+    return f'bookings-{session_pk % settings.BOOKING_QUEUES}'
+
+
+def process_booking_requests(session_pk, session_date):
+    """
+    Allocate seats to every pending queued booking of one session day, in arrival order.
+
+    Runs on the session's booking queue, so one worker owns the seats row: it is
+    locked and read once, requests are served in memory, and the results are written
+    back with a few bulk statements instead of one contended UPDATE per request.
+    Returns how many requests were processed.
+    """
+    session = Session.objects.only('price').get(pk=session_pk)
+
+    with transaction.atomic():
+        requests = list(BookingRequest.objects.filter(
+            session=session,
+            date=session_date,
+            status=BookingRequest.PENDING,
+        ).select_for_update(skip_locked=True).order_by('pk'))
+
+        if not requests:
+            return 0
+
+        # Seats of abandoned checkouts go back first, as claim_seats does
+        release_holds(SeatHold.objects.filter(session=session, date=session_date, expires_at__lte=timezone.now()))
+
+        seats = AvailableSeats.objects.select_for_update().filter(session=session, date=session_date).first()
+        remaining = seats.remaining if seats else 0
+        seat_map = list(seats.seat_map) if seats else []
+        sold = []
+
+        for request in requests:
+            if not remaining:
+                request.error = 'All tickets for this session have already been sold!'
+            elif any(index >= len(seat_map) for index in request.seats):
+                # Queued before the hall shrank
+                request.error = 'Some of the selected seats do not exist!'
+            elif any(seat_map[index] == '1' for index in request.seats):
+                request.error = 'Some of the selected seats are already taken!'
+            elif request.count_of_tickets > remaining:
+                request.error = 'Not enough available seats!'
+            else:
+                remaining -= request.count_of_tickets
+                for index in request.seats:
+                    seat_map[index] = '1'
+
+                request.status = BookingRequest.BOOKED
+                request.ticket = Ticket(
+                    user_id=request.user_id,
+                    session=session,
+                    count_of_tickets=request.count_of_tickets,
+                    total_price=request.count_of_tickets * session.price,
+                    data_session=session_date,
+                    seats=request.seats,
+                )
+                sold.append(request.ticket)
+                continue
+
+            request.status = BookingRequest.FAILED
+
+        if sold:
+            Ticket.objects.bulk_create(sold)
+            AvailableSeats.objects.filter(pk=seats.pk).update(
+                remaining=remaining,
+                occupied_seats=F('occupied_seats') + seats.remaining - remaining,
+                seat_map=''.join(seat_map),
+            )
+            SpendingEntry.objects.bulk_create([
+                SpendingEntry(user_id=ticket.user_id, ticket=ticket, amount=ticket.total_price) for ticket in sold
+            ])
+
+        BookingRequest.objects.bulk_update(requests, ['status', 'ticket', 'error'])
+
+    bump_version(SCHEDULE)
+    return len(requests)
+
+
+def aggregate_spending(batch_size=1000):
+    """
+    Fold ledger entries into User.total_spent, one batch per transaction.
+
+    Each batch is a single UPDATE of the affected users, so the user rows are
+    written once per batch instead of once per ticket. Returns the number of entries.
+    """
+    aggregated = 0
+
+    while True:
+        with transaction.atomic():
+            entries = list(SpendingEntry.objects.filter(aggregated=False).select_for_update(
+                skip_locked=True,
+            ).order_by('pk').values_list('pk', 'user_id', 'amount')[:batch_size])
+
+            if not entries:
+                return aggregated
+
+            totals = defaultdict(int)
+            for _, user_pk, amount in entries:
+                totals[user_pk] += amount
+
+            User.objects.filter(pk__in=totals).update(total_spent=F('total_spent') + Case(
+                *[When(pk=user_pk, then=Value(total)) for user_pk, total in totals.items()],
+                output_field=DecimalField(decimal_places=2, max_digits=12),
+            ))
+            SpendingEntry.objects.filter(pk__in=[pk for pk, _, _ in entries]).update(aggregated=True)
+
+        aggregated += len(entries)
+        if len(entries) < batch_size:
+            return aggregated
+
+
+def current_spent(user):
+    """User.total_spent plus what is still waiting in the ledger."""
+    pending = SpendingEntry.objects.filter(user=user, aggregated=False).aggregate(pending=Sum('amount'))['pending']
+    return user.total_spent + (pending or 0)
+
+
+def release_holds(holds):
+    """
+    Give the seats of `holds` back, one UPDATE per session day. Returns how many were released.
+
+    Holds locked by a confirm in progress are skipped.
+    """
+    with transaction.atomic():
+        released = list(holds.select_related('session__hall').select_for_update(skip_locked=True, of=('self',)))
+        if not released:
+            return 0
+
+        SeatHold.objects.filter(pk__in=[hold.pk for hold in released]).delete()
+
+        grouped = defaultdict(list)
+        for hold in released:
+            grouped[(hold.session, hold.date)].append(hold)
+
+        for (session, session_date), group in grouped.items():
+            freed = seat_mask(session.hall.size, [index for hold in group for index in hold.seats])
+            AvailableSeats.objects.filter(session=session, date=session_date).update(
+                remaining=F('remaining') + sum(hold.count_of_tickets for hold in group),
+                # Seats held before the hall was resized stay taken, like in resize_seats
+                seat_map=Coalesce(seat_map_and(freed.translate(str.maketrans('01', '10')), session.hall.size), 'seat_map'),
+            )
+
+    bump_version(SCHEDULE)
+    return len(released)
+
+
+def seat_mask(size, seats):
+    seats = set(seats)
+    return ''.join('1' if index in seats else '0' for index in range(size))
+
+
+def seat_map_and(mask, size=None):
+    """
+    seat_map & mask. Bit strings of different lengths make Postgres raise an error, so
+    with `size` rows whose map has another length (the hall was resized) give NULL instead.
+    """
+    expression = CombinedExpression(F('seat_map'), '&', Value(mask), output_field=SeatMapField())
+    if size is None:
+        return expression
+    return Case(When(Exact(Length('seat_map'), size), then=expression), output_field=SeatMapField())
+
+
+def seat_map_or(mask):
+    return CombinedExpression(F('seat_map'), '|', Value(mask), output_field=SeatMapField())
+
+
+def materialize_seats(sessions):
+    """
+    Create the seats row of every upcoming show date, with the full hall as `remaining`.
+
+    Rows that already exist are left alone, so this is safe to run again after the
+    date range grows. Expects `session.hall` to be loaded (or cheap to load).
+    """
+    today = date.today()
+    seats = []
+
+    for session in sessions:
+        day = max(session.start_date, today)
+        while day <= session.end_date:
+            seats.append(AvailableSeats(
+                session=session,
+                date=day,
+                capacity=session.hall.size,
+                remaining=session.hall.size,
+                seat_map=seat_mask(session.hall.size, ()),
+            ))
+            day += timedelta(days=1)
+
+    AvailableSeats.objects.bulk_create(seats, ignore_conflicts=True, batch_size=1000)
+
+
+def sync_seats(session):
+    """
+    Bring the seats rows of an edited session in line with its dates and hall.
+
+    Unbooked rows outside the new date range are dropped, upcoming rows take the
+    size of the (possibly new) hall, and missing dates are materialized.
+    """
+    AvailableSeats.objects.filter(session=session, occupied_seats=0).exclude(
+        date__range=(session.start_date, session.end_date),
+    ).delete()
+    resize_seats(AvailableSeats.objects.filter(session=session), session.hall.size)
+    materialize_seats([session])
+
+
+def resize_seats(seats, size):
+    # Seats sold or held before a hall shrank stay taken; nothing is left to book in that case.
+    seats.filter(date__gte=date.today()).exclude(capacity=size).update(
+        capacity=size,
+        remaining=Greatest(Value(size) - F('capacity') + F('remaining'), Value(0)),
+        # Pad with free seats, or cut off the seats that no longer exist
+        seat_map=Func(
+            F('seat_map'), Value(seat_mask(size, ())),
+            template=f'substring(%(expressions)s from 1 for {int(size)})', arg_joiner=' || ',
+            output_field=SeatMapField(),
+        ),
+    )
+
+
+def session_ranges(session, after_midnight=False):
+    """In-memory dates and seconds range of a session, like the expressions of Session's exclusion constraints."""
+    start_date, end_date = session.start_date, session.end_date
+    start = session.start_time.hour * 3600 + session.start_time.minute * 60 + session.start_time.second
+    end = session.end_time.hour * 3600 + session.end_time.minute * 60 + session.end_time.second
+
+    if session.start_time > session.end_time:
+        if after_midnight:
+            start_date, end_date, start = start_date + timedelta(days=1), end_date + timedelta(days=1), 0
+        else:
+            end += 24 * 60 * 60
+    return (start_date, end_date), (start, end)
+
+
+def sessions_overlap(session, other):
+    if session.hall_id != other.hall_id:
+        return False
+
+    for after_midnight in (False, True):
+        (start_date, end_date), (start, end) = session_ranges(session, after_midnight)
+        (other_start_date, other_end_date), (other_start, other_end) = session_ranges(other, after_midnight)
+        if start_date <= other_end_date and other_start_date <= end_date and start <= other_end and other_start <= end:
+            return True
+    return False
+
+
+def find_schedule_conflicts(sessions):
+    """
+    Check unsaved sessions against each other and the existing schedule in memory.
+
+    Existing sessions of the involved halls are loaded in a single query. Returns,
+    for every session, the session it clashes with, or None.
+    """
+    if not sessions:
+        return []
+
+    scheduled = defaultdict(list)
+    existing = Session.objects.filter(
+        hall_id__in={session.hall_id for session in sessions},
+        # A day either side for overnight shows that run into the next date
+        start_date__lte=max(session.end_date for session in sessions) + timedelta(days=1),
+        end_date__gte=min(session.start_date for session in sessions) - timedelta(days=1),
+    ).only('hall', 'start_date', 'end_date', 'start_time', 'end_time')
+
+    for session in existing:
+        scheduled[session.hall_id].append(session)
+
+    conflicts = []
+    for session in sessions:
+        conflict = next((other for other in scheduled[session.hall_id] if sessions_overlap(session, other)), None)
+        if conflict is None:
+            scheduled[session.hall_id].append(session)
+        conflicts.append(conflict)
+
+    return conflicts
@@ -0,0 +1,31 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .caching import HALLS, SCHEDULE, bump_version
+from .services import materialize_seats, resize_seats, sync_seats
+from .models import AvailableSeats, CinemaHall, Film, Session
+
+
+@receiver([post_save, post_delete], sender=CinemaHall)
+def invalidate_halls(sender, **kwargs):
+    bump_version(HALLS, SCHEDULE)
+
+
+@receiver([post_save, post_delete], sender=Film)
+@receiver([post_save, post_delete], sender=Session)
+@receiver([post_save, post_delete], sender=AvailableSeats)
+def invalidate_schedule(sender, **kwargs):
+    bump_version(SCHEDULE)
+
+
+@receiver(post_save, sender=Session)
+def update_session_seats(sender, instance, created, **kwargs):
+    if created:
+        materialize_seats([instance])
+    else:
+        sync_seats(instance)
+
+
+@receiver(post_save, sender=CinemaHall)
+def update_hall_seats(sender, instance, created, **kwargs):
+    if not created:
+        resize_seats(AvailableSeats.objects.filter(session__hall=instance), instance.size)
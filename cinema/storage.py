@@ -0,0 +1,82 @@
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+import hashlib
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class HashedMediaStorage(FileSystemStorage):
+    """
+    Names uploads after a hash of their content, e.g. images/3f0c...e1.jpg.
+
+    The same file uploaded twice is stored once: if the blob already exists the write
+    is skipped and its name returned. A name never changes content, so these URLs can be
+    cached forever (see the /media/ location in conf/nginx.conf).
+    """
+    digest_length = 32
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(directory, f'{digest.hexdigest()[:self.digest_length]}{extension}').replace('\\', '/')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Fingerprinted static files (cinema.3f0c5e1a2b4d.css) plus .gz and, when the brotli
+    package is installed, .br copies written at collectstatic time, for nginx's
+    gzip_static/brotli_static to send without compressing on every request.
+    """
+    compressible_extensions = ('.css', '.js', '.map', '.json', '.svg', '.txt', '.html', '.xml')
+    min_compress_size = 256
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed_names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names.add(hashed_name)
+            yield name, hashed_name, processed
+
+        if not dry_run:
+            for hashed_name in sorted(hashed_names):
+                self.compress(hashed_name)
+
+    def compress(self, name):
+        if not name.endswith(self.compressible_extensions) or self.size(name) < self.min_compress_size:
+            return
+
+        with self.open(name) as file:
+            content = file.read()
+
+        compressed = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressed['.br'] = brotli.compress(content, quality=11)
+
+        for extension, data in compressed.items():
+            # Not worth a second file (and an extra stat for nginx) if it barely shrinks
+            if len(data) < len(content) * 0.95:
+                self.delete(name + extension)
+                self._save(name + extension, ContentFile(data))
@@ -1,19 +1,90 @@
 from celery import shared_task
 from django.utils import timezone
-from cinema.models import AvailableSeats, Session
+from celery.utils.log import get_task_logger
+from collections import defaultdict
+from cinema.caching import SCHEDULE, bump_version
+from cinema.cleanup import delete_expired
+from cinema.models import Film, SeatHold
+from cinema.renditions import delete_renditions, generate_renditions, rendition_paths
+from cinema.services import aggregate_spending, process_booking_requests, release_holds
+from datetime import date
+import time
+
+logger = get_task_logger(__name__)
 
 
 @shared_task
 def delete_expired_seats():
     today = timezone.now().date()
-    expired_seats = AvailableSeats.objects.filter(date__lt=today)
-    expired_sessions = Session.objects.filter(end_date__lt=today)
-    expired_seats.delete()
-    expired_sessions.delete()
-    return f'Successfully deleted expired AvailableSeats, Sessions records'
+    totals = defaultdict(int)
+    started = time.monotonic()
+
+    # Every batch commits on its own, so a killed run just starts over on what is left
+    batches = delete_expired(today)
+    while True:
+        batch_started = time.monotonic()
+        deleted = next(batches, None)
+        if deleted is None:
+            break
+
+        elapsed = time.monotonic() - batch_started
+        rows = sum(deleted.values())
+        logger.info('Deleted %s in %.2fs (%.0f rows/s)', deleted, elapsed, rows / elapsed if elapsed else rows)
+        for model_name, count in deleted.items():
+            totals[model_name] += count
+
+    elapsed = time.monotonic() - started
+    rows = sum(totals.values())
+    summary = ', '.join(f'{count} {model_name}' for model_name, count in totals.items()) or 'nothing'
+    return f'Successfully deleted {summary} in {elapsed:.2f}s ({rows / elapsed if elapsed else rows:.0f} rows/s)'
+
+
+@shared_task
+def release_expired_holds():
+    released = release_holds(SeatHold.objects.filter(expires_at__lte=timezone.now()))
+    return f'Successfully released {released} expired seat holds'
+
+
+@shared_task
+def process_bookings(session_pk, session_date):
+    processed = process_booking_requests(session_pk, date.fromisoformat(session_date))
+    return f'Successfully processed {processed} booking requests'
+
+
+@shared_task
+def aggregate_user_spending():
+    aggregated = aggregate_spending()
+    return f'Successfully aggregated {aggregated} spending entries'
+
+
+@shared_task
+def generate_film_renditions(film_pk):
+    film = Film.objects.filter(pk=film_pk).first()
+    if film is None or not film.image:
+        return f'Film {film_pk} has no poster to render'
+
+    storage = film.image.storage
+    renditions = generate_renditions(film)
+
+    # Skip the write if the poster changed meanwhile: a new poster from the views or the
+    # admin queues its own run, and dedupe_media carries the renditions over to the new name
+    updated = Film.objects.filter(pk=film_pk, image=film.image.name).update(
+        renditions=renditions,
+        updated_at=timezone.now(),
+    )
+    if not updated:
+        current = Film.objects.filter(pk=film_pk).values_list('renditions', flat=True).first() or {}
+        delete_renditions(storage, rendition_paths(renditions) - rendition_paths(current))
+        return f'Poster of film {film_pk} changed, skipped its renditions'
+
+    # Only now that nothing points at them; unchanged renditions keep their names
+    delete_renditions(storage, rendition_paths(film.renditions) - rendition_paths(renditions))
+    bump_version(SCHEDULE)
+    return f'Successfully generated renditions for film {film_pk}'
 
 
 # celery -A main worker -l INFO
 # celery -A main worker -l INFO --pool=solo (запустити завдання)
 # celery -A main beat -l INFO
+# celery -A main worker -l INFO --pool=solo -Q bookings-0 -n bookings-0@%h (по одному воркеру на кожну чергу bookings-N, див. conf/celery-bookings.sh)
 
@@ -0,0 +1,18 @@
+from django import template
+from cinema.renditions import RENDITIONS, poster_sources
+
+register = template.Library()
+
+
+@register.inclusion_tag('cinema/poster.html')
+def poster(film, name, css_class='', lazy=True):
+    """Film poster as <picture>: WebP with a JPEG fallback, 1x/2x srcset sized for `name`."""
+    width, height = RENDITIONS[name]
+    return {
+        'film': film,
+        'width': width,
+        'height': height,
+        'css_class': css_class,
+        'lazy': lazy,
+        **poster_sources(film, name),
+    }
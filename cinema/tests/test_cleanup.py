@@ -0,0 +1,92 @@
+from datetime import date, timedelta
+from django.test import TestCase
+from cinema.cleanup import archive_expired_sessions, copy_rows, delete_expired_seats
+from cinema.tasks import delete_expired_seats as delete_expired_seats_task
+from cinema.services import book_tickets, hold_seats
+from cinema.factory import (
+    AvailableSeatsFactory,
+    SessionFactory,
+    TicketFactory,
+    UserFactory,
+)
+from cinema.models import (
+    ArchivedSession,
+    ArchivedTicket,
+    AvailableSeats,
+    BookingRequest,
+    SeatHold,
+    Session,
+    SpendingEntry,
+    Ticket,
+)
+
+
+class DeleteExpiredTestCase(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.today = date.today()
+        self.session = Session.objects.get(pk=SessionFactory().pk)
+
+    def test_delete_expired_seats_in_batches(self):
+        for days in range(1, 6):
+            AvailableSeatsFactory(session=self.session, date=self.today - timedelta(days=days))
+
+        batches = list(delete_expired_seats(self.today, batch_size=2))
+
+        self.assertEqual(batches, [{'AvailableSeats': 2}, {'AvailableSeats': 2}, {'AvailableSeats': 1}])
+        self.assertFalse(AvailableSeats.objects.filter(date__lt=self.today).exists())
+        self.assertEqual(AvailableSeats.objects.count(), 6)
+
+    def test_resume_after_interrupted_run(self):
+        for days in range(1, 6):
+            AvailableSeatsFactory(session=self.session, date=self.today - timedelta(days=days))
+
+        batches = delete_expired_seats(self.today, batch_size=2)
+        next(batches)
+        batches.close()
+
+        self.assertEqual(list(delete_expired_seats(self.today, batch_size=2)), [{'AvailableSeats': 2}, {'AvailableSeats': 1}])
+
+    def test_archive_expired_sessions(self):
+        ticket = book_tickets(self.user, self.session, 2, self.today)
+        hold_seats(self.user, self.session, 1, self.today)
+        BookingRequest.objects.create(user=self.user, session=self.session, date=self.today)
+        Session.objects.filter(pk=self.session.pk).update(end_date=self.today - timedelta(days=1))
+        active = SessionFactory(start_time='13:00', end_time='15:00')
+
+        batches = list(archive_expired_sessions(self.today))
+
+        self.assertEqual(batches, [{
+            'BookingRequest': 1, 'SeatHold': 1, 'Ticket': 1, 'AvailableSeats': 6, 'Session': 1,
+        }])
+        self.assertEqual(list(Session.objects.values_list('pk', flat=True)), [active.pk])
+        self.assertFalse(Ticket.objects.exists())
+        self.assertFalse(SeatHold.objects.exists())
+        self.assertIsNone(SpendingEntry.objects.get().ticket)
+
+        archived = ArchivedTicket.objects.select_related('session').get()
+        self.assertEqual(archived.pk, ticket.pk)
+        self.assertEqual(archived.total_price, ticket.total_price)
+        self.assertEqual(archived.data_creation, ticket.data_creation)
+        self.assertEqual(archived.session.pk, self.session.pk)
+        self.assertEqual(archived.session.hall_id, self.session.hall_id)
+
+    def test_archive_twice(self):
+        TicketFactory(user=self.user, session=self.session)
+        Session.objects.filter(pk=self.session.pk).update(end_date=self.today - timedelta(days=1))
+        sessions = Session.objects.filter(pk=self.session.pk)
+
+        self.assertEqual(copy_rows(sessions, ArchivedSession), 1)
+        self.assertEqual(copy_rows(sessions, ArchivedSession), 0)
+        list(archive_expired_sessions(self.today))
+
+        self.assertEqual(ArchivedSession.objects.count(), 1)
+        self.assertEqual(ArchivedTicket.objects.count(), 1)
+
+    def test_task_reports_rows(self):
+        AvailableSeatsFactory(session=self.session, date=self.today - timedelta(days=1))
+
+        result = delete_expired_seats_task()
+
+        self.assertIn('Successfully deleted 1 AvailableSeats', result)
+        self.assertIn('rows/s', result)
@@ -0,0 +1,124 @@
+import re
+from datetime import date, time, timedelta
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from cinema.factory import FilmFactory, UserFactory
+from cinema.models import ArchivedSession, ArchivedTicket, CinemaHall, Session, Ticket
+
+HOT_TABLES = ('cinema_session', 'cinema_ticket', 'cinema_archivedticket')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class QueryPlanTestCase(TestCase):
+    """
+    Runs the hot views against a seeded schedule and EXPLAINs every query they send,
+    failing if one that selects from a hot table reads that table with a sequential scan.
+    Joined tables are left to the planner: hashing a few hundred sessions can beat
+    probing the primary key for each row.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        today = date.today()
+        film = FilmFactory()
+        halls = CinemaHall.objects.bulk_create(CinemaHall(name=f'Hall {i}', size=50) for i in range(200))
+        cls.users = [UserFactory(username=f'user{i}', email=f'user{i}@gmail.com') for i in range(100)]
+
+        # Every hall runs back-to-back two-day sessions over ~5 months; a few per hall are on today
+        sessions = Session.objects.bulk_create(
+            Session(
+                film=film,
+                hall=hall,
+                price=50 + j,
+                start_time=time(8 + j % 12),
+                end_time=time(10 + j % 12),
+                start_date=today + timedelta(days=3 * j - 75 + i % 3),
+                end_date=today + timedelta(days=3 * j - 74 + i % 3),
+            )
+            for i, hall in enumerate(halls) for j in range(50)
+        )
+        Ticket.objects.bulk_create(
+            Ticket(
+                user=cls.users[i % len(cls.users)],
+                session=sessions[i * 7 % len(sessions)],
+                total_price=50,
+                data_session=today,
+            )
+            for i in range(20000)
+        )
+        archived = ArchivedSession.objects.bulk_create(
+            ArchivedSession(
+                id=sessions[-1].pk + i + 1,
+                film=film,
+                hall=halls[i % len(halls)],
+                price=50,
+                start_time=time(10),
+                end_time=time(12),
+                start_date=today - timedelta(days=400),
+                end_date=today - timedelta(days=399),
+            )
+            for i in range(1000)
+        )
+        ArchivedTicket.objects.bulk_create(
+            ArchivedTicket(
+                id=i + 1,
+                user=cls.users[i % len(cls.users)],
+                session=archived[i % len(archived)],
+                total_price=50,
+                data_session=today - timedelta(days=400),
+                data_creation=f'{today - timedelta(days=400)}T10:00:00Z',
+            )
+            for i in range(20000)
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {", ".join(HOT_TABLES)}')
+
+    def setUp(self):
+        self.user = self.users[0]
+
+    def assertIndexScans(self, url, data=None, **extra):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data, **extra)
+        self.assertEqual(response.status_code, 200)
+
+        checked = 0
+        for query in queries:
+            sql = query['sql']
+            table = re.search(r' FROM "(\w+)"', sql)
+            if not sql.startswith('SELECT') or not table or table[1] not in HOT_TABLES:
+                continue
+
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN {sql}')
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+
+            checked += 1
+            self.assertNotIn(f'Seq Scan on {table[1]}', plan, f'{sql}\n{plan}')
+
+        self.assertGreater(checked, 0)
+
+    def test_schedule_page(self):
+        self.client.force_login(self.user)
+
+        self.assertIndexScans(reverse('schedule_page'), {'date-filter': 'today'})
+        self.assertIndexScans(reverse('schedule_page'), {'date-filter': 'tomorrow', 'price_from': 60, 'price_to': 70})
+        self.assertIndexScans(reverse('schedule_page'), {'date-filter': 'tomorrow', 'time-filter': 'start_time', 'cursor': ''})
+
+    def test_session_filters(self):
+        self.assertIndexScans(reverse('session-list'), {'date-filter': 'today'})
+        self.assertIndexScans(reverse('session-list'), {'date-filter': 'tomorrow', 'price_from': 60, 'price_to': 70})
+        self.assertIndexScans(reverse('session-list'), {'date-filter': 'today', 'time_from': '10:00', 'time_to': '14:00'})
+
+    def test_ticket_list_view(self):
+        token = Token.objects.create(user=self.user)
+
+        self.assertIndexScans(reverse('ticket-list'), HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_booked_tickets_page(self):
+        self.client.force_login(self.user)
+
+        self.assertIndexScans(reverse('booked_tickets'))
+        self.assertIndexScans(reverse('booked_tickets'), {'history': 1, 'page': 3})
@@ -0,0 +1,110 @@
+from io import BytesIO
+import shutil
+import tempfile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from cinema.factory import AdminFactory, FilmFactory
+from cinema.models import Film
+from cinema.tasks import generate_film_renditions
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def poster_upload(name='poster.png', size=(1200, 1600), color='purple'):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class FilmRenditionsTestCase(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.film = FilmFactory(image=poster_upload())
+
+    def render_poster(self, name):
+        film = Film.objects.get(pk=self.film.pk)
+        return Template("{% load posters %}{% poster film '" + name + "' %}").render(Context({'film': film}))
+
+    def test_generate_renditions(self):
+        result = generate_film_renditions(self.film.pk)
+
+        self.assertEqual(result, f'Successfully generated renditions for film {self.film.pk}')
+        film = Film.objects.get(pk=self.film.pk)
+        self.assertEqual(film.renditions['source'], film.image.name)
+
+        storage = film.image.storage
+        for name, sizes in (('list', [(150, 200), (300, 400)]), ('detail', [(300, 400), (600, 800)])):
+            for fmt, image_format in (('jpeg', 'JPEG'), ('webp', 'WEBP')):
+                for path, size in zip(film.renditions[name][fmt], sizes):
+                    with storage.open(path) as file:
+                        image = Image.open(file)
+                        self.assertEqual((image.format, image.size), (image_format, size))
+
+    def test_regenerate_replaces_files(self):
+        generate_film_renditions(self.film.pk)
+        first = Film.objects.get(pk=self.film.pk).renditions
+
+        generate_film_renditions(self.film.pk)
+
+        self.assertEqual(Film.objects.get(pk=self.film.pk).renditions, first)
+
+    def test_new_poster_deletes_old_files(self):
+        generate_film_renditions(self.film.pk)
+        film = Film.objects.get(pk=self.film.pk)
+        old = film.renditions['list']['jpeg']
+
+        film.image = poster_upload('sequel.png', color='teal')
+        film.save()
+        generate_film_renditions(self.film.pk)
+
+        film = Film.objects.get(pk=self.film.pk)
+        self.assertEqual(film.renditions['source'], film.image.name)
+        self.assertFalse(any(film.image.storage.exists(path) for path in old))
+        self.assertTrue(all(film.image.storage.exists(path) for path in film.renditions['list']['jpeg']))
+
+    def test_poster_falls_back_to_upload(self):
+        html = self.render_poster('list')
+
+        self.assertIn(f'src="{self.film.image.url}"', html)
+        self.assertNotIn('srcset', html)
+
+    def test_poster_srcset(self):
+        generate_film_renditions(self.film.pk)
+
+        html = self.render_poster('list')
+
+        self.assertIn('<source type="image/webp" srcset="/media/renditions/films/', html)
+        self.assertRegex(html, r'srcset="/media/renditions/films/\d+/\w+\.jpg 1x, /media/renditions/films/\d+/\w+\.jpg 2x"')
+        self.assertIn('width="150" height="200"', html)
+        self.assertIn('loading="lazy"', html)
+
+    def test_film_create_page_queues_renditions(self):
+        self.client.force_login(AdminFactory())
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(reverse('create_film'), {'name': 'Dune', 'genre': 'sci-fi', 'image': poster_upload()})
+
+        self.assertTrue(Film.objects.filter(name='Dune').exists())
+        # The schedule cache bump, then the rendition task
+        self.assertEqual(len(callbacks), 2)
+
+    def test_admin_poster_change_queues_renditions(self):
+        self.client.force_login(AdminFactory())
+        url = reverse('admin:cinema_film_change', args=[self.film.pk])
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(url, {'name': self.film.name, 'genre': self.film.genre})
+        self.assertEqual(len(callbacks), 1)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(url, {'name': self.film.name, 'genre': self.film.genre, 'image': poster_upload('new.png')})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(callbacks), 2)
@@ -0,0 +1,317 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from django.core.management import call_command
+from datetime import date, timedelta
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.test import TestCase, TransactionTestCase
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.utils import timezone
+from cinema.services import (
+    aggregate_spending,
+    book_tickets,
+    confirm_hold,
+    current_spent,
+    hold_seats,
+    process_booking_requests,
+)
+from cinema.cleanup import archive_expired_sessions
+from cinema.tasks import release_expired_holds
+from cinema.factory import (
+    AvailableSeatsFactory,
+    SessionFactory,
+    UserFactory,
+)
+from cinema.models import AvailableSeats, BookingRequest, SeatHold, Session, SpendingEntry, Ticket
+
+User = get_user_model()
+
+
+class BookTicketsTestCase(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.session = Session.objects.get(pk=SessionFactory().pk)
+
+    def test_book_tickets(self):
+        ticket = book_tickets(self.user, self.session, 3, date.today())
+
+        self.assertEqual(ticket.total_price, Decimal('237.03'))
+        self.assertEqual(AvailableSeats.objects.get(session=self.session, date=date.today()).occupied_seats, 3)
+        self.assertEqual(AvailableSeats.objects.get(session=self.session, date=date.today()).remaining, 7)
+        self.assertEqual(current_spent(self.user), Decimal('237.03'))
+
+        aggregate_spending()
+        self.assertEqual(User.objects.get(pk=self.user.pk).total_spent, Decimal('237.03'))
+
+    def test_not_enough_seats(self):
+        with self.assertRaisesMessage(ValidationError, 'Not enough available seats!'):
+            book_tickets(self.user, self.session, 11, date.today())
+
+        self.assertFalse(Ticket.objects.exists())
+        self.assertEqual(User.objects.get(pk=self.user.pk).total_spent, 0)
+
+    def test_sold_out(self):
+        AvailableSeatsFactory(session=self.session, date=date.today(), occupied_seats=10)
+
+        with self.assertRaisesMessage(ValidationError, 'All tickets for this session have already been sold!'):
+            book_tickets(self.user, self.session, 1, date.today())
+
+    def test_seats_outside_hall(self):
+        with self.assertRaisesMessage(ValidationError, 'Some of the selected seats do not exist!'):
+            book_tickets(self.user, self.session, 1, date.today(), [10])
+
+    def test_seat_map_of_other_size(self):
+        # A seats row not yet resized to the hall, e.g. while the hall is being edited
+        AvailableSeats.objects.filter(session=self.session, date=date.today()).update(seat_map='0' * 12)
+
+        with self.assertRaisesMessage(ValidationError, 'The seats of this hall have changed, please choose your seats again!'):
+            book_tickets(self.user, self.session, 1, date.today(), [2])
+
+        self.assertFalse(Ticket.objects.exists())
+
+
+class SpendingLedgerTestCase(TestCase):
+    def setUp(self):
+        self.users = [UserFactory(username=f'user{i}', email=f'user{i}@gmail.com') for i in range(3)]
+        self.session = Session.objects.get(pk=SessionFactory(hall__size=20).pk)
+
+    def test_aggregate_spending(self):
+        for user in self.users + self.users[:1]:
+            book_tickets(user, self.session, 2, date.today())
+
+        with self.assertNumQueries(5):
+            self.assertEqual(aggregate_spending(), 4)
+
+        totals = dict(User.objects.values_list('username', 'total_spent'))
+        self.assertEqual(totals, {'user0': Decimal('316.04'), 'user1': Decimal('158.02'), 'user2': Decimal('158.02')})
+        self.assertEqual(aggregate_spending(), 0)
+
+    def test_recompute_total_spent(self):
+        book_tickets(self.users[0], self.session, 2, date.today())
+        book_tickets(self.users[1], self.session, 1, date.today())
+        aggregate_spending()
+        book_tickets(self.users[1], self.session, 1, date.today())
+        User.objects.filter(pk=self.users[2].pk).update(total_spent=50)
+
+        out = StringIO()
+        call_command('recompute_total_spent', '--dry-run', stdout=out)
+        self.assertIn('1 users drifted by 50.00 in total.', out.getvalue())
+        self.assertEqual(User.objects.get(pk=self.users[2].pk).total_spent, 50)
+
+        call_command('recompute_total_spent', stdout=StringIO())
+        aggregate_spending()
+
+        totals = dict(User.objects.values_list('username', 'total_spent'))
+        self.assertEqual(totals, {'user0': Decimal('158.02'), 'user1': Decimal('158.02'), 'user2': 0})
+
+    def test_recompute_counts_archived_tickets(self):
+        book_tickets(self.users[0], self.session, 2, date.today())
+        aggregate_spending()
+        Session.objects.filter(pk=self.session.pk).update(end_date=date.today() - timedelta(days=1))
+        list(archive_expired_sessions(date.today()))
+
+        out = StringIO()
+        call_command('recompute_total_spent', '--dry-run', stdout=out)
+        self.assertIn('0 users drifted by 0 in total.', out.getvalue())
+
+
+class SeatInventoryTestCase(TestCase):
+    def setUp(self):
+        self.session = SessionFactory()
+
+    def test_materialized_on_create(self):
+        seats = AvailableSeats.objects.filter(session=self.session)
+
+        self.assertEqual(seats.count(), 6)
+        self.assertEqual(set(seats.values_list('capacity', 'remaining')), {(10, 10)})
+
+    def test_date_range_change(self):
+        booked_date = date.today() + timedelta(days=5)
+        AvailableSeatsFactory(session=self.session, date=booked_date, occupied_seats=2)
+
+        self.session.end_date = date.today() + timedelta(days=2)
+        self.session.save()
+
+        dates = AvailableSeats.objects.filter(session=self.session).values_list('date', flat=True)
+        self.assertEqual(len(dates), 4)
+        self.assertIn(booked_date, dates)
+
+    def test_hall_resize(self):
+        AvailableSeatsFactory(session=self.session, date=date.today(), occupied_seats=4)
+
+        self.session.hall.size = 20
+        self.session.hall.save()
+        self.assertEqual(self.session.available_today(), 16)
+
+        self.session.hall.size = 3
+        self.session.hall.save()
+        self.assertEqual(self.session.available_today(), 0)
+
+
+class SeatHoldTestCase(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.session = Session.objects.get(pk=SessionFactory().pk)
+
+    def test_hold_counts_against_availability(self):
+        hold_seats(self.user, self.session, 4, date.today(), [0, 1, 2, 3])
+
+        self.assertEqual(self.session.available_today(), 6)
+        with self.assertRaisesMessage(ValidationError, 'Some of the selected seats are already taken!'):
+            book_tickets(self.user, self.session, 1, date.today(), [2])
+
+    def test_confirm_hold(self):
+        hold = hold_seats(self.user, self.session, 2, date.today())
+        ticket = confirm_hold(hold)
+
+        seats = AvailableSeats.objects.get(session=self.session, date=date.today())
+        self.assertEqual((seats.remaining, seats.occupied_seats), (8, 2))
+        self.assertEqual(ticket.total_price, Decimal('158.02'))
+        self.assertEqual(current_spent(self.user), Decimal('158.02'))
+        self.assertFalse(SeatHold.objects.exists())
+
+    def test_expired_hold(self):
+        hold = hold_seats(self.user, self.session, 10, date.today(), range(10))
+        SeatHold.objects.update(expires_at=timezone.now())
+
+        with self.assertRaisesMessage(ValidationError, 'Your hold has expired!'):
+            confirm_hold(hold)
+
+        # The next buyer gets the seats back without waiting for the sweep
+        book_tickets(self.user, self.session, 1, date.today(), [5])
+        self.assertEqual(self.session.available_today(), 9)
+        self.assertFalse(SeatHold.objects.exists())
+
+    def test_release_holds_seat_map_of_other_size(self):
+        hold_seats(self.user, self.session, 3, date.today(), [0, 1, 2])
+        SeatHold.objects.update(expires_at=timezone.now())
+        AvailableSeats.objects.filter(session=self.session, date=date.today()).update(seat_map='111' + '0' * 9)
+
+        release_expired_holds()
+
+        seats = AvailableSeats.objects.get(session=self.session, date=date.today())
+        self.assertEqual((seats.remaining, seats.seat_map), (10, '111000000000'))
+
+    def test_release_expired_holds(self):
+        hold_seats(self.user, self.session, 3, date.today(), [0, 1, 2])
+        SeatHold.objects.update(expires_at=timezone.now())
+
+        release_expired_holds()
+
+        seats = AvailableSeats.objects.get(session=self.session, date=date.today())
+        self.assertEqual(seats.remaining, 10)
+        self.assertEqual(seats.seat_map, '0' * 10)
+
+
+class BookingQueueTestCase(TestCase):
+    def setUp(self):
+        self.session = Session.objects.get(pk=SessionFactory().pk)
+        self.users = [UserFactory(username=f'user{i}', email=f'user{i}@gmail.com') for i in range(5)]
+
+    def queue(self, user, count_of_tickets, seats=()):
+        return BookingRequest.objects.create(
+            user=user,
+            session=self.session,
+            date=date.today(),
+            count_of_tickets=count_of_tickets,
+            seats=list(seats),
+        )
+
+    def test_requests_served_in_order(self):
+        first = self.queue(self.users[0], 4, [0, 1, 2, 3])
+        taken = self.queue(self.users[1], 1, [3])
+        second = self.queue(self.users[2], 5)
+        too_many = self.queue(self.users[3], 2)
+        last = self.queue(self.users[4], 1)
+
+        with self.assertNumQueries(12):
+            processed = process_booking_requests(self.session.pk, date.today())
+
+        statuses = dict(BookingRequest.objects.values_list('pk', 'status'))
+        self.assertEqual(processed, 5)
+        self.assertEqual(statuses[first.pk], BookingRequest.BOOKED)
+        self.assertEqual(statuses[taken.pk], BookingRequest.FAILED)
+        self.assertEqual(statuses[second.pk], BookingRequest.BOOKED)
+        self.assertEqual(statuses[too_many.pk], BookingRequest.FAILED)
+        self.assertEqual(statuses[last.pk], BookingRequest.BOOKED)
+
+        seats = AvailableSeats.objects.get(session=self.session, date=date.today())
+        self.assertEqual((seats.remaining, seats.occupied_seats), (0, 10))
+        self.assertEqual(seats.seat_map, '1111000000')
+        self.assertEqual(Ticket.objects.count(), 3)
+        self.assertEqual(SpendingEntry.objects.get(user=self.users[2]).amount, Decimal('395.05'))
+        self.assertEqual(
+            BookingRequest.objects.get(pk=too_many.pk).error,
+            'Not enough available seats!',
+        )
+
+    def test_expired_holds_released_first(self):
+        hold_seats(self.users[0], self.session, 10, date.today(), range(10))
+        SeatHold.objects.update(expires_at=timezone.now())
+        request = self.queue(self.users[1], 2, [4, 5])
+
+        process_booking_requests(self.session.pk, date.today())
+
+        self.assertEqual(BookingRequest.objects.get(pk=request.pk).status, BookingRequest.BOOKED)
+        self.assertFalse(SeatHold.objects.exists())
+        seats = AvailableSeats.objects.get(session=self.session, date=date.today())
+        self.assertEqual((seats.remaining, seats.seat_map), (8, '0000110000'))
+
+
+    def test_seats_gone_after_hall_shrank(self):
+        gone = self.queue(self.users[0], 1, [9])
+        booked = self.queue(self.users[1], 1, [2])
+        self.session.hall.size = 5
+        self.session.hall.save()
+
+        process_booking_requests(self.session.pk, date.today())
+
+        self.assertEqual(BookingRequest.objects.get(pk=gone.pk).status, BookingRequest.FAILED)
+        self.assertEqual(BookingRequest.objects.get(pk=gone.pk).error, 'Some of the selected seats do not exist!')
+        self.assertEqual(BookingRequest.objects.get(pk=booked.pk).status, BookingRequest.BOOKED)
+        self.assertEqual(AvailableSeats.objects.get(session=self.session, date=date.today()).seat_map, '00100')
+
+class ConcurrentBookingTestCase(TransactionTestCase):
+    def setUp(self):
+        self.session = Session.objects.get(pk=SessionFactory(hall__size=25).pk)
+        self.users = [UserFactory(username=f'user{i}', email=f'user{i}@gmail.com') for i in range(60)]
+
+    def book(self, user):
+        try:
+            book_tickets(user, self.session, 1, date.today())
+            return True
+        except ValidationError:
+            return False
+        finally:
+            connection.close()
+
+    def test_no_oversell(self):
+        with ThreadPoolExecutor(max_workers=30) as executor:
+            results = list(executor.map(self.book, self.users))
+
+        occupied_seats = AvailableSeats.objects.get(session=self.session, date=date.today()).occupied_seats
+        self.assertEqual(results.count(True), 25)
+        self.assertEqual(occupied_seats, 25)
+        self.assertEqual(Ticket.objects.filter(session=self.session).count(), 25)
+
+    def test_no_double_booked_seats(self):
+        # Every buyer wants two seats and neighbours overlap, e.g. (0, 1) and (1, 2)
+        def book_pair(user):
+            index = self.users.index(user) % 24
+            try:
+                book_tickets(user, self.session, 2, date.today(), [index, index + 1])
+                return True
+            except ValidationError:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=30) as executor:
+            results = list(executor.map(book_pair, self.users))
+
+        seats = [index for ticket in Ticket.objects.filter(session=self.session) for index in ticket.seats]
+        seat_map = AvailableSeats.objects.get(session=self.session, date=date.today()).seat_map
+        self.assertEqual(len(seats), len(set(seats)))
+        self.assertEqual(len(seats), 2 * results.count(True))
+        self.assertEqual(seat_map.count('1'), len(seats))
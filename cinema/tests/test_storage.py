@@ -0,0 +1,83 @@
+from io import StringIO
+import gzip
+import shutil
+import tempfile
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from cinema.factory import FilmFactory
+from cinema.storage import brotli
+from cinema.models import Film
+
+
+class HashedMediaStorageTestCase(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.media_root = media_root
+
+    def test_same_content_stored_once(self):
+        first = default_storage.save('images/poster.JPG', ContentFile(b'poster'))
+        second = default_storage.save('images/poster_copy.jpg', ContentFile(b'poster'))
+        other = default_storage.save('images/poster.jpg', ContentFile(b'other poster'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertRegex(first, r'^images/[0-9a-f]{32}\.jpg$')
+        self.assertEqual(len(default_storage.listdir('images')[1]), 2)
+
+    def test_dedupe_media(self):
+        plain = FileSystemStorage(location=self.media_root)
+        for name in ('images/anime2.jpg', 'images/anime2_iIyDJn6.jpg'):
+            plain.save(name, ContentFile(b'anime2'))
+        plain.save('images/anime3.jpg', ContentFile(b'anime3'))
+        films = [FilmFactory(image=name) for name in ('images/anime2.jpg', 'images/anime2_iIyDJn6.jpg', 'images/anime3.jpg')]
+        Film.objects.filter(pk=films[0].pk).update(renditions={'source': 'images/anime2.jpg'})
+
+        out = StringIO()
+        call_command('dedupe_media', '--dry-run', stdout=out)
+        self.assertIn('3 files to rename into 2 blobs, 6 bytes freed, 3 films to update.', out.getvalue())
+        self.assertEqual(len(plain.listdir('images')[1]), 3)
+
+        call_command('dedupe_media', stdout=StringIO())
+
+        images = dict(Film.objects.values_list('pk', 'image'))
+        self.assertEqual(images[films[0].pk], images[films[1].pk])
+        self.assertNotEqual(images[films[0].pk], images[films[2].pk])
+        self.assertEqual(sorted(plain.listdir('images')[1]), sorted(name.split('/')[1] for name in set(images.values())))
+        self.assertEqual(Film.objects.get(pk=films[0].pk).renditions['source'], images[films[0].pk])
+        with default_storage.open(images[films[2].pk]) as file:
+            self.assertEqual(file.read(), b'anime3')
+
+
+class CompressedManifestStaticFilesStorageTestCase(TestCase):
+    def setUp(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root, ignore_errors=True)
+        self.enterContext(override_settings(
+            STATIC_ROOT=static_root,
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+            STORAGES={
+                'default': {'BACKEND': 'cinema.storage.HashedMediaStorage'},
+                'staticfiles': {'BACKEND': 'cinema.storage.CompressedManifestStaticFilesStorage'},
+            },
+        ))
+
+    def test_collectstatic(self):
+        call_command('collectstatic', '--noinput', verbosity=0)
+
+        url = static('cinema/css/cinema.css')
+        self.assertRegex(url, r'^/static/cinema/css/cinema\.[0-9a-f]{12}\.css$')
+
+        name = url.removeprefix('/static/')
+        with staticfiles_storage.open(name) as file:
+            css = file.read()
+        with staticfiles_storage.open(f'{name}.gz') as file:
+            self.assertEqual(gzip.decompress(file.read()), css)
+        if brotli is not None:
+            with staticfiles_storage.open(f'{name}.br') as file:
+                self.assertEqual(brotli.decompress(file.read()), css)
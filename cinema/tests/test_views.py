@@ -1,9 +1,16 @@
 from datetime import date, timedelta
 from django.contrib.messages import get_messages
-from django.test import TestCase, Client
+from django.conf import settings
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.urls import reverse
+from django.utils import timezone
+from django.core.cache import cache
+from cinema.caching import HALLS
 from cinema.factory import (
+    AvailableSeatsFactory,
     UserFactory,
     SessionFactory,
     AdminFactory,
@@ -11,7 +18,8 @@ from cinema.factory import (
     FilmFactory,
     TicketFactory,
 )
-from cinema.models import Ticket, CinemaHall
+from cinema.cleanup import archive_expired_sessions
+from cinema.models import AvailableSeats, Session, Ticket, CinemaHall
 
 User = get_user_model()
 
@@ -47,6 +55,155 @@ class SessionTestCase(TestCase):
         self.assertIn(session_tomorrow, context['object_list'])
         self.assertEqual(str(context['date_filter']), 'tomorrow')
 
+    def test_list_session_available_seats(self):
+        AvailableSeatsFactory(session=self.session, date=date.today(), occupied_seats=4)
+        self.client.force_login(self.user)
+
+        url = reverse('schedule_page')
+        response = self.client.get(url)
+        self.assertEqual(response.context['object_list'][0].available_seats, 6)
+
+        response = self.client.get(url, {'date-filter': 'tomorrow'})
+        self.assertEqual(response.context['object_list'][0].available_seats, 10)
+
+        # One row per show date, materialized with the session; reads never add more
+        self.assertEqual(AvailableSeats.objects.count(), 6)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+    def test_list_session_query_count(self):
+        self.client.force_login(self.user)
+        url = reverse('schedule_page')
+
+        # Warm-up request so one-off writes (e.g. last_activity) don't skew the comparison
+        self.client.get(url, {'date-filter': 'tomorrow'})
+
+        with CaptureQueriesContext(connection) as few_sessions:
+            self.client.get(url, {'date-filter': 'tomorrow'})
+
+        SessionFactory.create_batch(4)
+
+        with CaptureQueriesContext(connection) as many_sessions:
+            response = self.client.get(url, {'date-filter': 'tomorrow'})
+
+        self.assertEqual(len(response.context['object_list']), 5)
+        self.assertEqual(len(few_sessions), len(many_sessions))
+
+    def test_list_session_pagination(self):
+        SessionFactory.create_batch(6)
+        url = reverse('schedule_page')
+
+        response = self.client.get(url, {'date-filter': 'tomorrow'})
+        self.assertEqual(len(response.context['object_list']), 5)
+        self.assertTrue(response.context['is_paginated'])
+
+        response = self.client.get(url, {'date-filter': 'tomorrow', 'page': 2})
+        self.assertEqual(len(response.context['object_list']), 2)
+
+    def test_list_session_cursor(self):
+        SessionFactory.create_batch(3, start_time='09:00')
+        SessionFactory.create_batch(3, start_time='11:00')
+        url = reverse('schedule_page')
+
+        seen = []
+        params = {'date-filter': 'tomorrow', 'time-filter': 'start_time', 'cursor': ''}
+        while True:
+            response = self.client.get(url, params)
+            seen += [session.pk for session in response.context['object_list']]
+            if not response.context['next_cursor']:
+                break
+            params['cursor'] = response.context['next_cursor']
+
+        expected = Session.objects.order_by('start_time', 'id').values_list('pk', flat=True)
+        self.assertEqual(seen, list(expected))
+
+        response = self.client.get(url, {'cursor': 'broken'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_list_session_cache(self):
+        url = reverse('schedule_page')
+        self.client.get(url, {'date-filter': 'tomorrow'})
+
+        with CaptureQueriesContext(connection) as cached:
+            response = self.client.get(url, {'date-filter': 'tomorrow'})
+        self.assertFalse([query for query in cached if 'cinema_session' in query['sql']])
+
+        self.session.price = '55.00'
+        self.session.save()
+
+        response = self.client.get(url, {'date-filter': 'tomorrow'})
+        self.assertEqual(str(response.context['object_list'][0].price), '55.00')
+
+    def test_list_session_cache_per_page(self):
+        url = reverse('schedule_page')
+        for i in range(6):
+            SessionFactory(hall=self.session.hall, start_time=f'{13 + i}:00', end_time=f'{13 + i}:30')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'date-filter': 'tomorrow', 'page': 2})
+        page_queries = [query['sql'] for query in queries if query['sql'].startswith('SELECT "cinema_session"')]
+        self.assertTrue(page_queries)
+        self.assertTrue(all('LIMIT 2 OFFSET 5' in sql for sql in page_queries))
+        self.assertEqual(len(response.context['object_list']), 2)
+        self.assertEqual(response.context['paginator'].count, 7)
+
+        with CaptureQueriesContext(connection) as cached:
+            response = self.client.get(url, {'date-filter': 'tomorrow', 'page': 2})
+        self.assertFalse([query for query in cached if 'cinema_session' in query['sql']])
+        self.assertEqual(response.context['page_obj'].number, 2)
+
+        response = self.client.get(url, {'date-filter': 'tomorrow', 'page': 1})
+        self.assertEqual(len(response.context['object_list']), 5)
+
+    def test_hall_list_cache(self):
+        url = reverse('hall_list_api')
+        self.client.get(url)
+
+        HallFactory(name='Hall10')
+
+        response = self.client.get(url)
+        self.assertIn('Hall10', [hall['name'] for hall in response.json()['halls']])
+
+    def test_hall_list_not_modified(self):
+        url = reverse('hall_list_api')
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        HallFactory(name='Hall10')
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Hall10', [hall['name'] for hall in response.json()['halls']])
+
+    def test_hall_list_modified_since_delete(self):
+        url = reverse('hall_list_api')
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        CinemaHall.objects.update(updated_at=an_hour_ago)
+        cache.set(f'version:{HALLS}', int(an_hour_ago.timestamp() * 10 ** 9), None)
+
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        # Leaves no newer updated_at behind
+        HallFactory(name='Hall10', updated_at=an_hour_ago).delete()
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+    def test_date_filter_session(self):
+        url = reverse('schedule_page')
+        self.client.get(url)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+
+        self.client.get(url, {'date-filter': 'tomorrow'})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.context['date_filter'], 'tomorrow')
+        self.assertFalse([query for query in queries if 'django_session' in query['sql']])
+
     def test_list_session_message(self):
         # Test with sold message
         url = reverse('schedule_page')
@@ -78,6 +235,27 @@ class SessionTestCase(TestCase):
         response = self.client.post(url, data)
         self.assertEqual(response.status_code, 403)
 
+    def test_create_overlapping_session(self):
+        url = reverse('create_session')
+        data = {
+            'film': self.film.pk,
+            'hall': self.session.hall.pk,
+            'price': '100.00',
+            'start_time': '11:00',
+            'end_time': '13:00',
+            'start_date': date.today() + timedelta(days=2),
+            'end_date': date.today() + timedelta(days=10)
+        }
+
+        self.client.force_login(self.admin)
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['form'].non_field_errors()), ['This hall has a session for that time.'])
+
+        data['start_time'], data['end_time'] = '12:30', '14:00'
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+
     def test_update_session(self):
         url = reverse('update_session', args=[self.session.pk])
         new_data = {
@@ -194,3 +372,34 @@ class TicketTestCase(TestCase):
         self.assertTemplateUsed(response, 'cinema/booked_tickets.html')
         self.assertEqual(response.context['object_list'].count(), 1)
         self.assertEqual(response.context['object_list'][0].user, self.user)
+
+    def test_ticket_list_query_count(self):
+        TicketFactory(user=self.user, session=self.session)
+        url = reverse('booked_tickets')
+
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as few_tickets:
+            self.client.get(url)
+
+        TicketFactory.create_batch(4, user=self.user)
+
+        with CaptureQueriesContext(connection) as many_tickets:
+            response = self.client.get(url)
+
+        self.assertEqual(len(response.context['object_list']), 5)
+        self.assertEqual(len(few_tickets), len(many_tickets))
+
+    def test_ticket_history(self):
+        ticket = TicketFactory(user=self.user, session=self.session)
+        Session.objects.filter(pk=self.session.pk).update(end_date=date.today() - timedelta(days=1))
+        list(archive_expired_sessions(date.today()))
+        url = reverse('booked_tickets')
+
+        response = self.client.get(url)
+        self.assertEqual(response.context['object_list'].count(), 0)
+
+        response = self.client.get(url, {'history': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([t.pk for t in response.context['object_list']], [ticket.pk])
+        self.assertContains(response, self.session.film.name)
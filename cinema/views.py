@@ -1,14 +1,17 @@
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.views import LoginView, LogoutView
 from django.contrib.auth import get_user_model
-from datetime import date, timedelta, datetime
+from datetime import date, timedelta, datetime, time
 from django.shortcuts import redirect
 from django.contrib.auth import login
 from django.urls import reverse_lazy
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
+from django.core.paginator import Page
 from django.contrib import messages
 from django.utils import timezone
-from django.db.models import F
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 from django.views.generic import (
     CreateView,
     UpdateView,
@@ -20,8 +23,11 @@ from cinema.forms import (
     SessionForm,
     FilmForm
 )
+from .caching import HALLS, SCHEDULE, conditional_listing, get_or_build
+from .services import book_tickets, current_spent
+from .tasks import generate_film_renditions
 from .models import (
-    AvailableSeats,
+    ArchivedTicket,
     CinemaHall,
     Session,
     Ticket,
@@ -37,15 +43,18 @@ class SchedulePage(ListView):
     template_name = 'cinema/schedule.html'
     paginate_by = 5
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        date_filter = self.request.GET.get('date-filter', self.request.session.get('date-filter', 'today'))
+    def get_date_filter(self):
+        return self.request.GET.get('date-filter', self.request.session.get('date-filter', 'today'))
+
+    def get_time_filter(self):
+        return self.request.GET.get('time-filter', 'end_time')
+
+    def get_queryset(self):
+        date_filter = self.get_date_filter()
         price_from = self.request.GET.get('price_from')
         price_to = self.request.GET.get('price_to')
-        time_filter = self.request.GET.get('time-filter', 'end_time')
-        sold_message = self.request.GET.get('sold_message')
 
-        sessions = Session.objects.all()
+        sessions = Session.objects.select_related('film', 'hall')
 
         if date_filter == 'today':
             today = date.today()
@@ -61,18 +70,79 @@ class SchedulePage(ListView):
         if price_from and price_to:
             sessions = sessions.filter(price__gte=price_from, price__lte=price_to)
 
-        if time_filter == 'end_time':
-            sessions = sessions.order_by('-start_time')
-        elif time_filter == 'start_time':
-            sessions = sessions.order_by('start_time')
+        seats_date = date.today() + timedelta(days=1) if date_filter == 'tomorrow' else date.today()
+        sessions = sessions.with_available_seats(seats_date)
+
+        # (start_time, id) is a total order, which keyset pagination relies on
+        if self.get_time_filter() == 'start_time':
+            sessions = sessions.order_by('start_time', 'id')
+        else:
+            sessions = sessions.order_by('-start_time', '-id')
+
+        self.cache_params = (date_filter, price_from, price_to, self.get_time_filter(), date.today())
+        if date_filter == 'today':
+            self.cache_params += (datetime.now().strftime('%H:%M'),)
+        return sessions
+
+    def paginate_queryset(self, queryset, page_size):
+        cursor = self.request.GET.get('cursor')
+        if cursor is None:
+            # Only the count and the rows of the requested page are cached; the page itself
+            # is still read with LIMIT/OFFSET
+            params = (*self.cache_params, self.request.GET.get(self.page_kwarg) or 1, page_size)
+            count, number, object_list = get_or_build(SCHEDULE, params, lambda: self.build_page(queryset, page_size))
+
+            paginator = self.get_paginator(queryset, page_size)
+            paginator.count = count
+            page = Page(object_list, number, paginator)
+            return paginator, page, object_list, page.has_other_pages()
+
+        # Keyset mode: seek past the last seen (start_time, id) instead of using OFFSET
+        if cursor:
+            try:
+                start_time, pk = cursor.rsplit('_', 1)
+                start_time, pk = time.fromisoformat(start_time), int(pk)
+            except ValueError:
+                raise Http404('Invalid cursor.')
+
+            if self.get_time_filter() == 'start_time':
+                queryset = queryset.filter(Q(start_time__gt=start_time) | Q(start_time=start_time, id__gt=pk))
+            else:
+                queryset = queryset.filter(Q(start_time__lt=start_time) | Q(start_time=start_time, id__lt=pk))
+
+        object_list = list(queryset[:page_size + 1])
+        has_next = len(object_list) > page_size
+        object_list = object_list[:page_size]
+
+        if has_next:
+            last = object_list[-1]
+            self.next_cursor = f'{last.start_time.isoformat()}_{last.pk}'
+
+        return None, None, object_list, has_next
+
+    def build_page(self, queryset, page_size):
+        paginator, page, object_list, is_paginated = super().paginate_queryset(queryset, page_size)
+        return paginator.count, page.number, list(object_list)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        date_filter = self.get_date_filter()
+        sold_message = self.request.GET.get('sold_message')
 
         if sold_message:
             messages.error(self.request, 'All tickets for this session have already been sold!')
 
-        context['object_list'] = sessions
+        query_params = self.request.GET.copy()
+        for param in ('page', 'cursor', 'sold_message'):
+            query_params.pop(param, None)
+
         context['date_filter'] = date_filter
-        context['time_filter'] = time_filter
-        self.request.session['date-filter'] = date_filter
+        context['time_filter'] = self.get_time_filter()
+        context['query_params'] = query_params.urlencode()
+        context['next_cursor'] = getattr(self, 'next_cursor', None)
+        # Writing an unchanged value would still mark the session modified and save it
+        if self.request.session.get('date-filter', 'today') != date_filter:
+            self.request.session['date-filter'] = date_filter
 
         return context
 
@@ -97,7 +167,7 @@ class LoginPage(LoginView):
         response = super().form_valid(form)
 
         self.request.user.last_activity = timezone.now()
-        self.request.user.save()
+        self.request.user.save(update_fields=['last_activity'])
 
         return response
 
@@ -144,7 +214,10 @@ class FilmCreatePage(AdminRequiredMixin, CreateView):
 
     def form_valid(self, form):
         messages.success(self.request, 'Film successfully created!')
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        film_pk = self.object.pk
+        transaction.on_commit(lambda: generate_film_renditions.delay(film_pk))
+        return response
 
 
 # CREATE HALL(ADMIN)
@@ -171,8 +244,15 @@ class SessionCreatePage(AdminRequiredMixin, CreateView):
         return reverse_lazy('create_session')
 
     def form_valid(self, form):
+        try:
+            with transaction.atomic():
+                response = super().form_valid(form)
+        except IntegrityError:
+            form.add_error(None, 'This hall has a session for that time.')
+            return self.form_invalid(form)
+
         messages.success(self.request, 'Session successfully created!')
-        return super().form_valid(form)
+        return response
 
 
 # UPDATE SESSION(ADMIN)
@@ -194,7 +274,12 @@ class SessionUpdatePage(AdminRequiredMixin, UpdateView):
             messages.error(self.request, 'Tickets have already been booked for this session!')
             return redirect('schedule_page')
 
-        return super().form_valid(form=form)
+        try:
+            with transaction.atomic():
+                return super().form_valid(form=form)
+        except IntegrityError:
+            form.add_error(None, 'This hall has a session for that time.')
+            return self.form_invalid(form)
 
 
 # UPDATE HALL(ADMIN)
@@ -222,8 +307,11 @@ class HallUpdatePage(AdminRequiredMixin, UpdateView):
 
 # LIST OF HALLS (JSON)
 def hall_list_api(request):
-    halls = CinemaHall.objects.values('id', 'name')
-    return JsonResponse({'halls': list(halls)})
+    def build_response():
+        halls = get_or_build(HALLS, 'list', lambda: list(CinemaHall.objects.values('id', 'name')))
+        return JsonResponse({'halls': halls})
+
+    return conditional_listing(request, HALLS, 'list', CinemaHall.objects.all(), build_response)
 
 
 # BOOK TICKETS(USER)
@@ -249,38 +337,23 @@ class TicketBookPage(LoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         session_pk = self.kwargs['pk']
-        session = Session.objects.get(pk=session_pk)
+        session = Session.objects.select_related('hall').get(pk=session_pk)
         count_of_tickets = form.cleaned_data['count_of_tickets']
         date_filter = self.kwargs['date_filter']
-        available_seats = session.available_tomorrow() if date_filter == 'tomorrow' else session.available_today()
-        user = self.request.user
 
         if count_of_tickets <= 0:
             messages.error(self.request, "Count of tickets must be greater than zero!")
             return redirect('schedule_page')
 
-        if available_seats < count_of_tickets:
-            messages.error(self.request, 'Not enough available seats!')
-            return redirect('schedule_page')
-
         session_date = date.today() + timedelta(days=1) if date_filter == 'tomorrow' else date.today()
 
-        available_seats_obj, created = AvailableSeats.objects.get_or_create(session=session, date=session_date)
-        available_seats_obj.occupied_seats += count_of_tickets
-        available_seats_obj.save()
-
-        total_price = count_of_tickets * session.price
-        self.request.user.total_spent = F('total_spent') + total_price
-
-        self.object = form.save(commit=False)
-        self.object.user = user
-        self.object.session = session
-        self.object.count_of_tickets = count_of_tickets
-        self.object.total_price = total_price
-        self.object.data_session = session_date
-        self.object.save()
+        try:
+            self.object = book_tickets(self.request.user, session, count_of_tickets, session_date)
+        except ValidationError as error:
+            messages.error(self.request, error.message)
+            return redirect('schedule_page')
 
-        return super().form_valid(form=form)
+        return redirect(self.get_success_url())
 
 
 # BOOKED TICKETS(USER)
@@ -291,4 +364,12 @@ class BookedTicketsPage(LoginRequiredMixin, ListView):
     paginate_by = 5
 
     def get_queryset(self):
-        return Ticket.objects.filter(user=self.request.user)
\ No newline at end of file
+        # Tickets of ended sessions live in the archive; ?history=1 pages through those instead
+        model = ArchivedTicket if self.request.GET.get('history') else Ticket
+        return model.objects.filter(user=self.request.user).select_related('session__film', 'session__hall')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['total_spent'] = current_spent(self.request.user)
+        context['history'] = bool(self.request.GET.get('history'))
+        return context
\ No newline at end of file
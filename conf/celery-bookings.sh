@@ -0,0 +1,13 @@
+#!/bin/sh
+# One solo worker per booking queue (bookings-0 .. bookings-N-1, see cinema.services.booking_queue),
+# so each queue is served in order without one busy session holding up the others.
+pids=''
+i=0
+while [ "$i" -lt "${BOOKING_QUEUES:-4}" ]; do
+    celery -A main worker -l INFO --pool=solo -Q "bookings-$i" -n "bookings-$i@%h" &
+    pids="$pids $!"
+    i=$((i + 1))
+done
+
+trap 'kill -TERM $pids; wait' TERM INT
+wait
@@ -16,4 +16,20 @@ app.conf.beat_schedule = {
         # 'schedule': 15.0,
         'schedule': crontab(hour='22', minute='00'),
     },
+    'release-expired-holds': {
+        'task': 'cinema.tasks.release_expired_holds',
+        'schedule': 30.0,
+    },
+    'aggregate-user-spending': {
+        'task': 'cinema.tasks.aggregate_user_spending',
+        'schedule': 30.0,
+    },
+    'flush-last-activity': {
+        'task': 'api.tasks.flush_last_activity',
+        'schedule': 30.0,
+    },
+    'delete-idle-tokens': {
+        'task': 'api.tasks.delete_idle_tokens',
+        'schedule': 60.0,
+    },
 }
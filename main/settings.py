@@ -48,6 +48,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'api',
@@ -99,6 +100,12 @@ DATABASES = {
         'PASSWORD': os.getenv('DATABASE_PASSWORD'),
         'HOST': os.getenv('DATABASE_HOST'),
         'PORT': os.getenv('DATABASE_PORT'),
+        # Keep connections open between requests instead of reconnecting every time
+        'CONN_MAX_AGE': int(os.getenv('DATABASE_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.getenv('DATABASE_CONN_HEALTH_CHECKS', 'True') == 'True',
+        # Behind a transaction-pooling proxy (e.g. PgBouncer pool_mode=transaction) a cursor
+        # can't outlive its transaction, so .iterator() must not use server-side cursors
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DATABASE_TRANSACTION_POOLING') == 'True',
         'TEST': {
             'NAME': 'mytestdatabase',
         },
@@ -145,9 +152,48 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# Fingerprinted, pre-compressed files; needs `collectstatic` before the site can render
+STATIC_MANIFEST = os.getenv('STATIC_MANIFEST') == 'True'
+
+# Cache
+# Redis in production (CACHE_URL), per-process local memory otherwise, e.g. in tests
+if os.getenv('CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+# Whether celery workers see the cache of the web processes
+CACHE_SHARED = bool(os.getenv('CACHE_URL'))
+
+# Last activity (seconds)
+LAST_ACTIVITY_TIMEOUT = 60
+LAST_ACTIVITY_GRANULARITY = int(os.getenv('LAST_ACTIVITY_GRANULARITY', 10))
+# Buffered timestamps are written by a celery task, so buffering needs the shared cache (CACHE_URL)
+LAST_ACTIVITY_BUFFERED = os.getenv('LAST_ACTIVITY_BUFFERED') == 'True'
+
+# Seat holds during checkout (seconds)
+SEAT_HOLD_TIMEOUT = int(os.getenv('SEAT_HOLD_TIMEOUT', 300))
+
+# Queued booking: requests go to BOOKING_QUEUES celery queues, one worker per queue
+BOOKING_QUEUED = os.getenv('BOOKING_QUEUED') == 'True'
+BOOKING_QUEUES = int(os.getenv('BOOKING_QUEUES', 4))
+
+# How long booking responses are kept for Idempotency-Key replays (seconds)
+IDEMPOTENCY_KEY_TIMEOUT = int(os.getenv('IDEMPOTENCY_KEY_TIMEOUT', 60 * 60 * 24))
+# How long a request in progress holds its key; above the gunicorn (30) and nginx (60) timeouts
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', 90))
 
 # Session
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# 'cached_db' reads through the cache and keeps the table as a fallback, 'cache' skips the table entirely
+SESSION_ENGINE = f"django.contrib.sessions.backends.{os.getenv('SESSION_BACKEND', 'cached_db')}"
 SESSION_COOKIE_NAME = 'session_id'
 
 
@@ -156,6 +202,19 @@ SESSION_COOKIE_NAME = 'session_id'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+STORAGES = {
+    # Uploads are named by content hash, so duplicates are stored once and URLs never change
+    'default': {
+        'BACKEND': 'cinema.storage.HashedMediaStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'cinema.storage.CompressedManifestStaticFilesStorage' if STATIC_MANIFEST
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 